@@ -1,10 +1,12 @@
+from bson import ObjectId
 from common.db import dbInstance
 from common.helpers.types import TypeAuthInput, TypeUser
-import bcrypt
+from common.helpers.passwords import checkPassword, hashPassword, needsRehash
 from flask import abort, session
+from pymongo.errors import PyMongoError
 from werkzeug.exceptions import HTTPException
 
-userCollection = dbInstance.db['USER']
+userCollection = dbInstance.collection('USER')
 
 def userLoggedIn():
     userData = session.get('user')
@@ -22,11 +24,15 @@ def userLogin(loginInput: TypeAuthInput):
         if not userData:
             abort(401, 'Invalid Credentials')
         
-        if bcrypt.checkpw(loginInput['password'].encode(), userData['password']):
+        if checkPassword(loginInput['password'], userData['password']):
+            # upgrade the hash to the configured cost while the plain password is at hand
+            if needsRehash(userData['password']):
+                rehashPassword(userData['_id'], loginInput['password'])
+
             userData.pop('password')
             userData['_id'] = str(userData['_id'])
             
-            session['user'] = userData
+            session['user'] = buildSessionUser(userData)
             
             return {
                 'data': userData
@@ -42,5 +48,27 @@ def userLogout():
     session.clear()
     return None, 204
 
+# helper function
+def buildSessionUser(userData:TypeUser) -> dict:
+    # only what verifySession and the controllers read, keeps every session read and write small
+    sessionUser = {
+        '_id': userData['_id'],
+        'userRole': userData['userRole']
+    }
+    if userData.get('branch'):
+        sessionUser['branch'] = {
+            'branchId': userData['branch']['branchId'],
+            'branchName': userData['branch']['branchName']
+        }
+    return sessionUser
 
-
+def rehashPassword(userId:ObjectId, password:str) -> None:
+    try:
+        userCollection.update_one({'_id': userId}, {
+            '$set': {
+                'password': hashPassword(password)
+            }
+        })
+    except (HTTPException, PyMongoError) as e:
+        # the login already succeeded, the next one will try again
+        print(f'Warning: Failed rehash password - {str(e)}')
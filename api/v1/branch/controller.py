@@ -1,39 +1,70 @@
+import re
 from datetime import datetime, UTC
-from typing import List
+from typing import Any, List
 from bson import ObjectId
 from flask import abort, g
 from api.v1.middlewares.verifyRole import verifyRole
 from api.v1.product.controller import findProductById
 from common.db import dbInstance
+from common.helpers.identityMap import forgetDocument, getDocument, rememberDocument
+from common.helpers.pagination import isUnpaginated, paginate, parseLimit
+from common.helpers.responseCache import invalidateResponseCache
+from config import Config
+from common.helpers.writes import deleteOneOr404, updateOneOr404
 from common.helpers.types import TypeBranch, TypeBranchProduct, TypeBranchProductInput
 from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
 from pymongo.errors import WriteError
 from werkzeug.exceptions import HTTPException
 
-branchCollection = dbInstance.db['VMS BRANCH']
+branchCollection = dbInstance.collection('VMS BRANCH')
+branchProductCollection = dbInstance.collection('BRANCH PRODUCT')
+
+# branch inventory lives in BRANCH PRODUCT, keyed by (branchId, productId)
+branchProjection = {'product': 0}
+branchSummaryProjection = {'branchName': 1, 'activeStatus': 1}
+branchProductProjection = {'_id': 0, 'branchId': 0, 'nameLower': 0}
+branchProductSortFields = {
+    'name': 'name',
+    'count': 'count',
+    'merk': 'merk',
+    'condition': 'condition',
+    'updateDate': 'setup.updateDate'
+}
+
+def findAllBranch(params:dict[str, Any]) -> tuple[dict[str, List[TypeBranch]], int]:
+    # summary by default, full inventory only with ?product=true
+    includeProduct = params.get('product') == 'true'
 
-def findAllBranch() -> tuple[dict[str, List[TypeBranch]], int]:
     try:
-        allBranchData = list(branchCollection.find())
-        
-        return {
-            'data': [
-                {**branch, '_id': str(branch['_id'])}
-                for branch in allBranchData
-            ]
-        }, 200
+        branchPage = paginate(
+            branchCollection,
+            {},
+            [('_id', ASCENDING)],
+            params,
+            branchProjection if includeProduct else branchSummaryProjection
+        )
+        if includeProduct:
+            attachBranchProducts(branchPage['data'])
+        else:
+            attachBranchSummaries(branchPage['data'])
+
+        return branchPage, 200
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
         abort(500, str(e))
 
-def findBranchById(branchId: str) -> tuple[dict[str, TypeBranch], int]:
+def findBranchById(branchId: str, params:dict[str, Any] = None) -> tuple[dict[str, TypeBranch], int]:
+    includeProduct = bool(params) and params.get('product') == 'true'
+
     try:
-        branchData = branchCollection.find_one({
-            '_id': ObjectId(branchId),
-        })
-        if not branchData:
-            abort(404, 'Branch Data Not Found')
+        branchData = findBranchDocument(ObjectId(branchId))
+        if includeProduct:
+            attachBranchProducts([branchData])
+        else:
+            branchData = {'_id': branchData['_id'], **{field: branchData[field] for field in branchSummaryProjection if field in branchData}}
+            attachBranchSummaries([branchData])
 
         return {
             'data': {**branchData, '_id': str(branchData['_id'])}
@@ -50,14 +81,11 @@ def findBranchByUser() -> tuple[dict[str, TypeBranch], int]:
     userData = g.user
 
     try:
-        branchData = branchCollection.find_one({
-            '_id': ObjectId(userData['branch']['branchId'])
-        })
-        if not branchData:
-            abort(404, 'Branch Data Not Found')
+        branchData = findBranchDocument(ObjectId(userData['branch']['branchId']))
+        attachBranchProducts([branchData])
 
         return {
-            'data': {**branchData, '_id': str(branchData['_id'])}
+            'data': branchData
         }, 200
     except InvalidId:
         abort(422, 'Invalid Branch ID')
@@ -67,18 +95,35 @@ def findBranchByUser() -> tuple[dict[str, TypeBranch], int]:
         abort(500, str(e))
 
 @verifyRole(['branch'])
-def findAllBranchProductByUser() -> tuple[dict[str, List[TypeBranchProduct]], int]:
+def findAllBranchProductByUser(params:dict[str, Any]) -> tuple[dict[str, List[TypeBranchProduct]], int]:
     userData = g.user
 
     try:
-        branchData = branchCollection.find_one({
-            '_id': ObjectId(userData['branch']['branchId'])
-        })
-        if not branchData:
-            abort(404, 'Branch Data Not Found')
+        query = buildBranchProductListQuery(params)
+        query['branchId'] = ObjectId(userData['branch']['branchId'])
+
+        sortField = branchProductSortFields.get(params.get('sort', ''), '_id')
+        sortDirection = DESCENDING if params.get('order') == 'desc' else ASCENDING
+        cursor = branchProductCollection.find(query, branchProductProjection).sort([
+            (sortField, sortDirection),
+            ('_id', sortDirection)
+        ])
+
+        if isUnpaginated(params):
+            return {
+                'data': list(cursor)
+            }, 200
+
+        pageSize = parseLimit(params, 'pageSize')
+        page = parseInteger(params.get('page', 1), 'Invalid Page')
+        if page < 1:
+            abort(422, 'Invalid Page')
 
         return {
-            'data': branchData['product']
+            'data': list(cursor.skip((page - 1) * pageSize).limit(pageSize)),
+            'page': page,
+            'pageSize': pageSize,
+            'total': branchProductCollection.count_documents(query)
         }, 200
     except InvalidId:
         abort(422, 'Invalid Branch ID')
@@ -92,18 +137,18 @@ def findBranchProductByIdAndUser(productId: str) -> tuple[dict[str, TypeBranchPr
     userData = g.user
 
     try:
-        branchData = branchCollection.find_one(
+        branchProductData = branchProductCollection.find_one(
             {
-                '_id': ObjectId(userData['branch']['branchId']),
-                'product.productId': productId
-            }, 
-            {'product.$': 1}
+                'branchId': ObjectId(userData['branch']['branchId']),
+                'productId': productId
+            },
+            branchProductProjection
         )
-        if not branchData or not branchData.get('product'):
+        if not branchProductData:
             abort(404, 'Product Not Found')
 
         return {
-            'data': branchData['product'][0]
+            'data': branchProductData
         }, 200
     except InvalidId:
         abort(422, 'Invalid Product ID')
@@ -115,45 +160,68 @@ def findBranchProductByIdAndUser(productId: str) -> tuple[dict[str, TypeBranchPr
 @verifyRole(['branch'])
 def insertBranchProductByUser(branchProductInput: TypeBranchProductInput) -> tuple[dict[str, TypeBranchProduct], int]:
     userData = g.user
-    
-    try:
-        # check if product already exist
-        anotherBranchProductData = branchCollection.find_one({
-            '_id': ObjectId(userData['branch']['branchId']),
-            'product.productId': branchProductInput['productId']
-        })
-        if anotherBranchProductData:
-            abort(422, 'Product already exists in this branch')
 
+    try:
         # get product data from BE
         productData = findProductById(branchProductInput['productId'])[0]['data']
-        productData['productId'] = productData['_id']
-        productData.pop('_id')
+        productId = productData.pop('_id')
+
+        # the branch is checked first, a missing branch never gets an inventory row
+        branchId = ObjectId(userData['branch']['branchId'])
+        branchData = touchBranch(branchId)
+
+        # insert only if the product is not in this branch yet
+        branchProductData = {
+            **productData,
+            'count': branchProductInput['count'],
+            'setup': {
+                'createDate': datetime.now(UTC),
+                'updateDate': datetime.now(UTC),
+                'createUser': userData['_id'],
+                'updateUser': userData['_id']
+            }
+        }
+        response = branchProductCollection.update_one(
+            {'branchId': branchId, 'productId': productId},
+            {'$setOnInsert': {**branchProductData, 'nameLower': productData['name'].lower()}},
+            upsert=True
+        )
+        if not response.upserted_id:
+            abort(422, 'Product already exists in this branch')
+        invalidateResponseCache('VMS BRANCH', 'BRANCH PRODUCT')
+
+        return {**branchData, 'product': [{'productId': productId, **branchProductData}]}, 200
+    except WriteError as e:
+        errorMessage = e.details.get('errmsg', str(e))
+        abort(422, errorMessage)
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        abort(500, str(e))
+
+@verifyRole(['branch'])
+def updateBranchProductByIdAndUser(productId: str, branchProductInput: TypeBranchProductInput) -> tuple[dict[str, TypeBranchProduct], int]:
+    userData = g.user
 
-        branchDataUpdated = branchCollection.find_one_and_update(
-            {'_id': ObjectId(userData['branch']['branchId'])}, 
+    try:
+        branchId = ObjectId(userData['branch']['branchId'])
+        branchProductData = updateOneOr404(
+            branchProductCollection,
+            {'branchId': branchId, 'productId': productId},
             {
-                '$push': {
-                    'product': {
-                        **productData,
-                        'count': branchProductInput['count'],
-                        'setup': {
-                            'createDate': datetime.now(UTC),
-                            'updateDate': datetime.now(UTC),
-                            'createUser': userData['_id'],
-                            'updateUser': userData['_id']
-                        }
-                    }
-                },
                 '$set': {
+                    'count': branchProductInput['count'],
                     'setup.updateDate': datetime.now(UTC),
                     'setup.updateUser': userData['_id']
                 }
             },
-            return_document=True
+            'Product Not Found',
+            branchProductProjection
         )
+        branchData = touchBranch(branchId)
+        invalidateResponseCache('VMS BRANCH', 'BRANCH PRODUCT')
 
-        return {**branchDataUpdated, '_id': str(branchDataUpdated['_id'])}, 200
+        return {**branchData, 'product': [branchProductData]}, 200
     except WriteError as e:
         errorMessage = e.details.get('errmsg', str(e))
         abort(422, errorMessage)
@@ -163,31 +231,82 @@ def insertBranchProductByUser(branchProductInput: TypeBranchProductInput) -> tup
         abort(500, str(e))
 
 @verifyRole(['branch'])
-def updateBranchProductByIdAndUser(productId: str, branchProductInput: TypeBranchProductInput) -> tuple[dict[str, TypeBranchProduct], int]:
+def updateBranchProductsByUser(branchProductInputs: List[TypeBranchProductInput]) -> tuple[dict, int]:
     userData = g.user
-    
+
+    if not isinstance(branchProductInputs, list):
+        abort(422, 'Invalid Branch Product Input')
+
     try:
-        # check if branch product exist
-        findBranchProductByIdAndUser(productId)
-        
-        branchDataUpdated = branchCollection.find_one_and_update(
-            {
-                '_id': ObjectId(userData['branch']['branchId']),
-                'product.productId': productId
-            }, 
-            {
+        branchId = ObjectId(userData['branch']['branchId'])
+
+        # validate input, the last count wins for a repeated product
+        results = []
+        branchProductCounts = {}
+        for branchProductInput in branchProductInputs:
+            productId = branchProductInput.get('productId') if isinstance(branchProductInput, dict) else None
+            count = branchProductInput.get('count') if isinstance(branchProductInput, dict) else None
+            if not isinstance(productId, str) or type(count) is not int or count < 0:
+                results.append({'productId': productId, 'status': 'invalid'})
+                continue
+            branchProductCounts[productId] = count
+
+        # one timestamp for every write of this request, bson dates keep milliseconds
+        updateDate = datetime.now(UTC)
+        updateDate = updateDate.replace(microsecond=updateDate.microsecond // 1000 * 1000)
+        updatedProductIds = set()
+        if branchProductCounts:
+            response = branchProductCollection.bulk_write([
+                UpdateOne(
+                    {'branchId': branchId, 'productId': productId},
+                    {
+                        '$set': {
+                            'count': count,
+                            'setup.updateDate': updateDate,
+                            'setup.updateUser': userData['_id']
+                        }
+                    }
+                ) for productId, count in branchProductCounts.items()
+            ], ordered=False)
+            if response.matched_count == len(branchProductCounts):
+                updatedProductIds = set(branchProductCounts)
+            elif response.matched_count:
+                # the bulk result has no per write match, read back the rows this request wrote
+                updatedProductIds = {
+                    branchProduct['productId']
+                    for branchProduct in branchProductCollection.find(
+                        {
+                            'branchId': branchId,
+                            'productId': {'$in': list(branchProductCounts)},
+                            'setup.updateDate': updateDate,
+                            'setup.updateUser': userData['_id']
+                        },
+                        {'_id': 0, 'productId': 1}
+                    )
+                }
+
+        if updatedProductIds:
+            branchCollection.update_one({'_id': branchId}, {
                 '$set': {
-                    'product.$.count': branchProductInput['count'],
-                    'product.$.setup.updateDate': datetime.now(UTC),
-                    'product.$.setup.updateUser': userData['_id'],
-                    'setup.updateDate': datetime.now(UTC),
+                    'setup.updateDate': updateDate,
                     'setup.updateUser': userData['_id']
                 }
-            }, 
-            return_document=True
-        )
+            })
+            forgetDocument('VMS BRANCH', branchId)
+            invalidateResponseCache('VMS BRANCH', 'BRANCH PRODUCT')
 
-        return {**branchDataUpdated, '_id': str(branchDataUpdated['_id'])}, 200
+        results += [{
+            'productId': productId,
+            'count': count,
+            'status': 'updated' if productId in updatedProductIds else 'not found'
+        } for productId, count in branchProductCounts.items()]
+
+        return {
+            'data': results,
+            'updated': len(updatedProductIds)
+        }, 200
+    except InvalidId:
+        abort(422, 'Invalid Branch ID')
     except WriteError as e:
         errorMessage = e.details.get('errmsg', str(e))
         abort(422, errorMessage)
@@ -199,21 +318,120 @@ def updateBranchProductByIdAndUser(productId: str, branchProductInput: TypeBranc
 @verifyRole(['branch'])
 def removeBranchProductByIdAndUser(productId: str) -> tuple[None, int]:
     userData = g.user
-    
-    try:
-        # check if branch product exist
-        findBranchProductByIdAndUser(productId)
 
-        branchCollection.update_one(
+    try:
+        deleteOneOr404(
+            branchProductCollection,
             {
-                '_id': ObjectId(userData['branch']['branchId']),
-                'product.productId': productId
+                'branchId': ObjectId(userData['branch']['branchId']),
+                'productId': productId
             },
-            {'$pull': {'product': {'productId': productId}}}
+            'Product Not Found'
         )
+        invalidateResponseCache('BRANCH PRODUCT')
 
         return None, 204
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
-        abort(500, str(e))
\ No newline at end of file
+        abort(500, str(e))
+
+# helper function
+def parseInteger(value: Any, errorMessage: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        abort(422, errorMessage)
+
+def buildBranchProductListQuery(params:dict[str, Any]) -> dict:
+    query = {}
+
+    if params.get('name'):
+        # a case sensitive anchored prefix on the lowercased copy stays an index range scan
+        query['nameLower'] = {'$regex': f'^{re.escape(params["name"].lower())}'}
+    if params.get('vendorId'):
+        query['vendor.vendorId'] = params['vendorId']
+    if params.get('condition'):
+        query['condition'] = params['condition']
+
+    countRange = {}
+    if params.get('minCount'):
+        countRange['$gte'] = parseInteger(params['minCount'], 'Invalid Count Range')
+    if params.get('maxCount'):
+        countRange['$lte'] = parseInteger(params['maxCount'], 'Invalid Count Range')
+    if countRange:
+        query['count'] = countRange
+
+    return query
+
+def attachBranchProducts(branches: List[TypeBranch]) -> None:
+    # one query for the products of every branch, keeps the embedded response shape
+    branchProducts = {branch['_id']: [] for branch in branches}
+    if not branchProducts:
+        return
+
+    for branchProduct in branchProductCollection.find(
+        {'branchId': {'$in': list(branchProducts)}},
+        {'_id': 0, 'nameLower': 0}
+    ).sort('_id', ASCENDING):
+        branchProducts[branchProduct.pop('branchId')].append(branchProduct)
+
+    for branch in branches:
+        branch['product'] = branchProducts[branch['_id']]
+
+def attachBranchSummaries(branches: List[TypeBranch]) -> None:
+    # product count, total units and low stock count are computed by the server
+    branchIds = [branch['_id'] for branch in branches]
+    if not branchIds:
+        return
+
+    branchSummaries = {
+        branchSummary.pop('_id'): branchSummary
+        for branchSummary in branchProductCollection.aggregate([
+            {'$match': {'branchId': {'$in': branchIds}}},
+            {'$group': {
+                '_id': '$branchId',
+                'productCount': {'$sum': 1},
+                'totalUnits': {'$sum': '$count'},
+                'lowStockCount': {'$sum': {
+                    '$cond': [{'$lt': ['$count', Config.LOW_STOCK_THRESHOLD]}, 1, 0]
+                }}
+            }}
+        ])
+    }
+
+    for branch in branches:
+        branch.update(branchSummaries.get(branch['_id'], {
+            'productCount': 0,
+            'totalUnits': 0,
+            'lowStockCount': 0
+        }))
+
+def findBranchDocument(branchId: ObjectId) -> TypeBranch:
+    branchData = getDocument('VMS BRANCH', branchId)
+    if branchData is None:
+        branchData = branchCollection.find_one({'_id': branchId}, branchProjection)
+        if not branchData:
+            abort(404, 'Branch Data Not Found')
+        rememberDocument('VMS BRANCH', branchId, branchData)
+
+    return branchData
+
+def touchBranch(branchId: ObjectId) -> TypeBranch:
+    branchDataUpdated = branchCollection.find_one_and_update(
+        {'_id': branchId},
+        {
+            '$set': {
+                'setup.updateDate': datetime.now(UTC),
+                'setup.updateUser': g.user['_id']
+            }
+        },
+        branchProjection,
+        return_document=True
+    )
+    if not branchDataUpdated:
+        abort(404, 'Branch Data Not Found')
+    rememberDocument('VMS BRANCH', branchId, branchDataUpdated)
+
+    # the caller answers with only the products it wrote, reloading the whole inventory per write is O(inventory)
+    return branchDataUpdated
@@ -1,18 +1,22 @@
 from flask import Blueprint, jsonify, request
 
-from api.v1.branch.controller import findAllBranch, findAllBranchProductByUser, findBranchById, findBranchByUser, findBranchProductByIdAndUser, insertBranchProductByUser, removeBranchProductByIdAndUser, updateBranchProductByIdAndUser
+from api.v1.branch.controller import findAllBranch, findAllBranchProductByUser, findBranchById, findBranchByUser, findBranchProductByIdAndUser, insertBranchProductByUser, removeBranchProductByIdAndUser, updateBranchProductByIdAndUser, updateBranchProductsByUser
+from common.helpers.responseCache import cacheResponse
 
 
 branchRoutes = Blueprint('branchRoutes', __name__, url_prefix='/v1/branch')
 
 @branchRoutes.route('', methods=['GET'])
+@cacheResponse('VMS BRANCH', 'BRANCH PRODUCT')
 def getAllBranch():
-    data, status = findAllBranch()
+    params = request.args
+    data, status = findAllBranch(params)
     return jsonify(data), status
 
 @branchRoutes.route('/<string:branchId>', methods=['GET'])
 def getBranchById(branchId: str):
-    data, status = findBranchById(branchId)
+    params = request.args
+    data, status = findBranchById(branchId, params)
     return jsonify(data), status
 
 @branchRoutes.route('/user', methods=['GET'])
@@ -22,7 +26,8 @@ def getBranchByUser():
 
 @branchRoutes.route('/user/product', methods=['GET'])
 def getAllBranchProductByUser():
-    data, status = findAllBranchProductByUser()
+    params = request.args
+    data, status = findAllBranchProductByUser(params)
     return jsonify(data), status
 
 @branchRoutes.route('/user/product', methods=['POST'])
@@ -30,6 +35,11 @@ def createBranchProductByUser():
     data, status = insertBranchProductByUser(request.json)
     return jsonify(data), status
 
+@branchRoutes.route('/user/product/bulk', methods=['PUT'])
+def editBranchProductsByUser():
+    data, status = updateBranchProductsByUser(request.json)
+    return jsonify(data), status
+
 @branchRoutes.route('/user/product/<string:productId>', methods=['GET'])
 def getBranchProductByIdAndUser(productId: str):
     data, status = findBranchProductByIdAndUser(productId)
@@ -1,24 +1,28 @@
 from datetime import datetime, UTC
+from typing import Any
 from bson import ObjectId
+from pymongo import ASCENDING
 from pymongo.errors import WriteError
 from common.db import dbInstance
+from common.helpers.cache import TTLCache
+from common.helpers.identityMap import forgetDocument, getDocument, rememberDocument
+from common.helpers.pagination import paginate
+from common.helpers.responseCache import getTagVersions, invalidateResponseCache
+from common.helpers.writes import activeDocumentQuery, idProjection, updateOneOr404
 from common.helpers.types import TypeMasterBank, TypeMasterBankInput
 from flask import abort, g
 from bson.errors import InvalidId
 from werkzeug.exceptions import HTTPException
+from config import Config
 
-masterBankCollection = dbInstance.db['VMS BANK']
+masterBankCollection = dbInstance.collection('VMS BANK')
+# entries carry the VMS BANK tag version, a write in any worker bumps it
+masterBankCache = TTLCache('masterBank', Config.REFERENCE_CACHE_SIZE, Config.REFERENCE_CACHE_TTL)
 
-def findAllMasterBank() -> tuple[list[TypeMasterBank], int]:
+def findAllMasterBank(params:dict[str, Any]) -> tuple[list[TypeMasterBank], int]:
+    # shared across workers by the response cache, a per process copy would outlive the tag bump in other workers
     try:
-        allMasterBankData = list(masterBankCollection.find({'activeStatus': True}))
-        
-        return {
-            'data': [
-                {**masterBank, '_id': str(masterBank['_id'])}
-                for masterBank in allMasterBankData
-            ]
-        }, 200
+        return paginate(masterBankCollection, {'activeStatus': True}, [('_id', ASCENDING)], params), 200
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
@@ -26,14 +30,26 @@ def findAllMasterBank() -> tuple[list[TypeMasterBank], int]:
 
 def findMasterBankById(masterBankId:str) -> tuple[TypeMasterBank, int]:
     try:
-        masterBankData = masterBankCollection.find_one({
-            '_id': ObjectId(masterBankId),
-            'activeStatus': True
-        })
-        if not masterBankData:
-            abort(404, 'Master Bank Data not Found')
+        tagVersions = None
+        masterBankData = getDocument('VMS BANK', masterBankId)
+        if masterBankData is None:
+            # read before mongo, a write that lands in between leaves the entry stale
+            tagVersions = getTagVersions('VMS BANK')
+            cachedMasterBank = masterBankCache.get(masterBankId) if tagVersions else None
+            if cachedMasterBank and cachedMasterBank[0] == tagVersions:
+                masterBankData = cachedMasterBank[1]
+        if masterBankData is None:
+            masterBankData = masterBankCollection.find_one({
+                '_id': ObjectId(masterBankId),
+                'activeStatus': True
+            })
+            if not masterBankData:
+                abort(404, 'Master Bank Data not Found')
+            if tagVersions:
+                masterBankCache.set(masterBankId, (tagVersions, masterBankData))
+        rememberDocument('VMS BANK', masterBankId, masterBankData)
 
-        return {**masterBankData, '_id': str(masterBankData['_id'])}, 200
+        return masterBankData, 200
     except InvalidId:
         abort(422, 'Invalid Master Bank Id')
     except Exception as e:
@@ -56,6 +72,7 @@ def insertMasterBank(masterBankInput:TypeMasterBankInput) -> tuple[TypeMasterBan
         }
 
         response = masterBankCollection.insert_one(masterBankData)
+        invalidateResponseCache('VMS BANK')
 
         return {**masterBankData, '_id':str(response.inserted_id)}, 201
     except WriteError as e:
@@ -68,11 +85,9 @@ def insertMasterBank(masterBankInput:TypeMasterBankInput) -> tuple[TypeMasterBan
 
 def updateMasterBank(masterBankId:str, masterBankInput:TypeMasterBankInput) -> tuple[TypeMasterBank, int]:
     try:
-        # check if master bank data exists
-        findMasterBankById(masterBankId)
-
-        masterBankDataUpdated = masterBankCollection.find_one_and_update(
-            {'_id': ObjectId(masterBankId)}, 
+        masterBankDataUpdated = updateOneOr404(
+            masterBankCollection,
+            activeDocumentQuery(masterBankId),
             {
                 '$set': {
                     'name': masterBankInput['name'],
@@ -80,11 +95,14 @@ def updateMasterBank(masterBankId:str, masterBankInput:TypeMasterBankInput) -> t
                     'setup.updateDate': datetime.now(UTC),
                     'setup.updateUser': g.user['_id']
                 }
-            }, 
-            return_document=True
+            },
+            'Master Bank Data not Found'
         )
+        invalidateMasterBankCache(masterBankId)
 
-        return {**masterBankDataUpdated, '_id': str(masterBankDataUpdated['_id'])}, 200
+        return masterBankDataUpdated, 200
+    except InvalidId:
+        abort(422, 'Invalid Master Bank Id')
     except WriteError as e:
         errorMessage = e.details.get('errmsg', str(e))
         abort(422, errorMessage)
@@ -95,22 +113,31 @@ def updateMasterBank(masterBankId:str, masterBankInput:TypeMasterBankInput) -> t
 
 def removeMasterBank(masterBankId:str) -> tuple[None, int]:
     try:
-        # check if master bank data exists
-        findMasterBankById(masterBankId)
-
-        masterBankCollection.update_one(
-            {'_id': ObjectId(masterBankId)}, 
+        updateOneOr404(
+            masterBankCollection,
+            activeDocumentQuery(masterBankId),
             {
                 '$set': {
                     'activeStatus': False,
                     'setup.updateDate': datetime.now(UTC),
                     'setup.updateUser': g.user['_id']
                 }
-            }
+            },
+            'Master Bank Data not Found',
+            idProjection
         )
+        invalidateMasterBankCache(masterBankId)
 
         return None, 204
+    except InvalidId:
+        abort(422, 'Invalid Master Bank Id')
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
-        abort(500, str(e))
\ No newline at end of file
+        abort(500, str(e))
+
+# helper function
+def invalidateMasterBankCache(masterBankId:str) -> None:
+    forgetDocument('VMS BANK', masterBankId)
+    masterBankCache.invalidate(masterBankId)
+    invalidateResponseCache('VMS BANK')
\ No newline at end of file
@@ -1,11 +1,14 @@
 from flask import Blueprint, jsonify, request
 from api.v1.master_bank.controller import findAllMasterBank, findMasterBankById, insertMasterBank, removeMasterBank, updateMasterBank
+from common.helpers.responseCache import cacheResponse
 
 masterBankRoutes = Blueprint('masterBankRoutes', __name__, url_prefix='/v1/bank')
 
 @masterBankRoutes.route('', methods=['GET'])
+@cacheResponse('VMS BANK')
 def getAllMasterBank():
-    data, status = findAllMasterBank()
+    params = request.args
+    data, status = findAllMasterBank(params)
     return jsonify(data), status
 
 @masterBankRoutes.route('/<string:masterBankId>', methods=['GET'])
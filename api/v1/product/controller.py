@@ -1,18 +1,27 @@
 from datetime import datetime, UTC
-from typing import Any, List
+from typing import Any, Iterator, List
 from bson import ObjectId
 from flask import abort, g
 from api.v1.middlewares.verifyRole import verifyRole
 from common.db import dbInstance
+from common.helpers.writes import idProjection, updateOneOr404
 from common.helpers.types import TypeProduct, TypeProductInput
+from common.helpers.identityMap import forgetDocument, getDocument, rememberDocument
+from common.helpers.pagination import paginate
+from common.helpers.responseCache import invalidateResponseCache
+from common.helpers.streaming import streamCursor
 from bson.errors import InvalidId
+from pymongo import ASCENDING
 import api.v1.vendor.controller as vendorController
 from pymongo.errors import WriteError
 from werkzeug.exceptions import HTTPException
 
-productCollection = dbInstance.db['PRODUCT']
+productCollection = dbInstance.collection('PRODUCT')
+# the paginated list is response cached, only the uncached stream reads a secondary
+productReadCollection = dbInstance.collection('PRODUCT', secondary=True)
+productListSort = [('_id', ASCENDING)]
 
-def findAllProduct(params:dict[str, Any]) -> tuple[list[TypeProduct], int]:
+def buildProductListQuery(params:dict[str, Any]) -> dict:
     active = params.get('active', False)
     query = {}
 
@@ -21,27 +30,36 @@ def findAllProduct(params:dict[str, Any]) -> tuple[list[TypeProduct], int]:
     elif active == 'false':
         query['activeStatus'] = False
 
-    try:
-        allProductData = list(productCollection.find(query))
+    return query
 
-        return {
-            'data': [
-                {**product, '_id': str(product['_id'])}
-                for product in allProductData
-            ]
-        }, 200
+def findAllProduct(params:dict[str, Any]) -> tuple[list[TypeProduct], int]:
+    query = buildProductListQuery(params)
+
+    try:
+        return paginate(productCollection, query, productListSort, params), 200
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
         abort(500, str(e))
 
+def streamAllProduct(params:dict[str, Any]) -> tuple[Iterator[dict], int]:
+    query = buildProductListQuery(params)
+
+    try:
+        return streamCursor(productReadCollection, query, productListSort), 200
+    except Exception as e:
+        abort(500, str(e))
+
 def findProductById(productId:str) -> tuple[TypeProduct, int]:
     try:
-        productData = productCollection.find_one({
-            '_id': ObjectId(productId)
-        })
-        if not productData:
-            abort(404, 'Product Data Not Found')
+        productData = getDocument('PRODUCT', productId)
+        if productData is None:
+            productData = productCollection.find_one({
+                '_id': ObjectId(productId)
+            })
+            if not productData:
+                abort(404, 'Product Data Not Found')
+            rememberDocument('PRODUCT', productId, productData)
 
         return {
             'data': {**productData, '_id': str(productData['_id'])}
@@ -62,10 +80,7 @@ def findProductsByIds(productIds: List[str]) -> tuple[list[TypeProduct], int]:
         ))
 
         return {
-            'data': [
-                {**product, '_id': str(product['_id'])}
-                for product in products
-            ]
+            'data': products
         }, 200
     except InvalidId:
         abort(422, 'Invalid Product ID')
@@ -100,6 +115,7 @@ def insertProduct(productInput:TypeProductInput) -> tuple[TypeProduct, int]:
             }
         }
         response = productCollection.insert_one(productData)
+        invalidateResponseCache('PRODUCT')
 
         return {**productData, '_id': str(response.inserted_id)}, 201
     except WriteError as e:
@@ -113,9 +129,6 @@ def insertProduct(productInput:TypeProductInput) -> tuple[TypeProduct, int]:
 @verifyRole(['inventory'])
 def updateProduct(productId:str, productInput:TypeProductInput) -> tuple[TypeProduct, int]:
     try:
-        # check if product data exists
-        findProductById(productId)
-
         # check if another product name already exists
         anotherProductData = validateUniqueField('name', productInput['name'], productId)
         if anotherProductData:
@@ -124,7 +137,8 @@ def updateProduct(productId:str, productInput:TypeProductInput) -> tuple[TypePro
         # validate vendor data with BE
         vendorData = vendorController.findVendorById(productInput['vendorId'])[0]['data']
 
-        productDataUpdated = productCollection.find_one_and_update(
+        productDataUpdated = updateOneOr404(
+            productCollection,
             {'_id': ObjectId(productId)},
             {
                 '$set': {
@@ -134,11 +148,15 @@ def updateProduct(productId:str, productInput:TypeProductInput) -> tuple[TypePro
                     'setup.updateDate': datetime.now(UTC),
                     'setup.updateUser': g.user['_id']
                 }
-            }, 
-            return_document=True
+            },
+            'Product Data Not Found'
         )
+        forgetDocument('PRODUCT', productId)
+        invalidateResponseCache('PRODUCT')
 
-        return {**productDataUpdated, '_id': str(productDataUpdated['_id'])}, 200
+        return productDataUpdated, 200
+    except InvalidId:
+        abort(422, 'Invalid Product ID')
     except WriteError as e:
         errorMessage = e.details.get('errmsg', str(e))
         abort(422, errorMessage)
@@ -150,16 +168,19 @@ def updateProduct(productId:str, productInput:TypeProductInput) -> tuple[TypePro
 @verifyRole(['inventory'])
 def removeProduct(productId:str)->tuple[None, int]:
     try:
-        # check if product data exists
-        findProductById(productId)
-    
-        productCollection.update_one({
-            '_id' : ObjectId(productId)
-        }, {
-            '$set': {
-                'activeStatus': False
-            }
-        })
+        updateOneOr404(
+            productCollection,
+            {'_id': ObjectId(productId)},
+            {
+                '$set': {
+                    'activeStatus': False
+                }
+            },
+            'Product Data Not Found',
+            idProjection
+        )
+        forgetDocument('PRODUCT', productId)
+        invalidateResponseCache('PRODUCT')
     except InvalidId:
         abort(422, 'Invalid Vendor ID')
     except Exception as e:
@@ -1,12 +1,20 @@
 from flask import Flask, Blueprint, jsonify, request
 
-from api.v1.product.controller import findAllProduct, findProductById, findProductsByIds, insertProduct, removeProduct, updateProduct
+from api.v1.product.controller import findAllProduct, findProductById, findProductsByIds, insertProduct, removeProduct, streamAllProduct, updateProduct
+from common.helpers.streaming import getStreamFormat, streamResponse
+from common.helpers.responseCache import cacheResponse
 
 productRoutes = Blueprint('ProductRoutes', __name__, url_prefix='/v1/product')
 
 @productRoutes.route('', methods=['GET'])
+@cacheResponse('PRODUCT')
 def getAllProduct():
     params = request.args
+    streamFormat = getStreamFormat(params)
+    if streamFormat:
+        documents, status = streamAllProduct(params)
+        return streamResponse(documents, streamFormat), status
+
     data, status = findAllProduct(params)
     return jsonify(data), status
 
@@ -1,56 +1,67 @@
 from datetime import UTC, datetime
-from typing import List
+from typing import Any, Iterator, List
 from bson import ObjectId
 from flask import abort, g
 from api.v1.middlewares.verifyRole import verifyRole
 from common.db import dbInstance
+from common.helpers.identityMap import forgetDocument, getDocument, rememberDocument
+from common.helpers.pagination import paginate
+from common.helpers.responseCache import invalidateResponseCache
+from common.helpers.streaming import streamCursor
 from common.helpers.types import TypeRequest, TypeRequestInput
 from bson.errors import InvalidId
-from pymongo.errors import WriteError
-from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, WriteError
+from pymongo import DeleteOne, DESCENDING, UpdateMany, UpdateOne
+from werkzeug.exceptions import HTTPException
 
-requestCollection = dbInstance.db['REQUEST']
-productCollection = dbInstance.db['PRODUCT']
-branchCollection = dbInstance.db['VMS BRANCH']
+requestCollection = dbInstance.collection('REQUEST')
+requestReadCollection = dbInstance.collection('REQUEST', secondary=True)
+productCollection = dbInstance.collection('PRODUCT')
+branchCollection = dbInstance.collection('VMS BRANCH')
+branchProductCollection = dbInstance.collection('BRANCH PRODUCT')
+requestListSort = [
+    ('status', DESCENDING),
+    ('setup.createDate', DESCENDING),
+    ('_id', DESCENDING)
+]
 
-def findAllRequest() -> tuple[dict[str, List[TypeRequest]], int]:
+def buildRequestListQuery() -> dict:
+    userData = g.user
+    query = {}
+    if userData['userRole'] == 'branch':
+        query['branch.branchId'] = userData['branch']['branchId']
+
+    return query
+
+def findAllRequest(params:dict[str, Any]) -> tuple[dict[str, List[TypeRequest]], int]:
     try:
-        userData = g.user
-        if userData['userRole'] == 'inventory':
-            allRequestData = list(requestCollection.find().sort([
-                ('status', -1),
-                ('setup.createDate', -1)
-            ]))
-
-        elif userData['userRole'] == 'branch':
-            allRequestData = list(requestCollection.find({
-                'branch.branchId': userData['branch']['branchId']
-            }).sort([
-                ('status', -1),
-                ('setup.createDate', -1)
-            ]))
+        return paginate(requestReadCollection, buildRequestListQuery(), requestListSort, params), 200
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        abort(500, str(e))
 
-        return {
-            'data': [
-                {**request, '_id': str(request['_id'])}
-                for request in allRequestData
-            ]
-        }, 200
+def streamAllRequest() -> tuple[Iterator[dict], int]:
+    try:
+        return streamCursor(requestReadCollection, buildRequestListQuery(), requestListSort), 200
     except Exception as e:
         abort(500, str(e))
 
 def findRequestById(requestId: str) -> tuple[dict[str, TypeRequest], int]:
     try:
-        requestData = requestCollection.find_one({
-            '_id': ObjectId(requestId),
-        })
-        if not requestData:
-            return {
-                'message': 'Request Data Not Found'
-            }, 404
+        requestData = getDocument('REQUEST', requestId)
+        if requestData is None:
+            requestData = requestCollection.find_one({
+                '_id': ObjectId(requestId),
+            })
+            if not requestData:
+                return {
+                    'message': 'Request Data Not Found'
+                }, 404
+            rememberDocument('REQUEST', requestId, requestData)
 
         return {
-            'data': {**requestData, '_id': str(requestData['_id'])}
+            'data': requestData
         }, 200
     except InvalidId:
         abort(422, 'Invalid Request ID')
@@ -107,122 +118,393 @@ def insertRequest(requestInput: TypeRequestInput) -> tuple[dict[str, TypeRequest
 @verifyRole(['inventory'])
 def acceptRequest(requestId: str) -> tuple[dict, int]:
     try:
-        # get request data
-        requestData = findRequestById(requestId)[0]['data']
-        requestData.pop('_id')
-
-        # get products from product collection
-        productIds = [ObjectId(product['productId']) for product in requestData['product']]
-        inventoryProducts = {
-            str(product['_id']): product
-            for product in productCollection.find(
-                {'_id': {'$in': productIds}},
-                {
-                    '_id': 1, 
-                    'count': 1,
-                    'vendor': 1,
-                    'merk': 1,
-                    'condition': 1,
-                    'name': 1
-                }
-            )
-        }
+        requestObjectId = ObjectId(requestId)
+    except (InvalidId, TypeError):
+        abort(422, 'Invalid Request ID')
 
-        # check if products stock is enough for request
-        for requestProduct in requestData['product']:
-            currentProduct = inventoryProducts.get(requestProduct['productId'])
-            if not currentProduct or currentProduct['count'] < requestProduct['quantity']:
+    requestAccepted = None
+    decreasedProducts = []
+    undoBranchProductQueries = []
+
+    try:
+        # claim the request, only a request that is still on request can be accepted
+        requestAccepted = requestCollection.find_one_and_update({
+            '_id': requestObjectId,
+            'status': 'on request'
+        }, {
+            '$set': {
+                'status': 'accepted',
+                'setup.updateDate': datetime.now(UTC),
+                'setup.updateUser': g.user['_id']
+            }
+        }, return_document=True)
+        if not requestAccepted:
+            if not requestCollection.find_one({'_id': requestObjectId}, {'_id': 1}):
                 return {
-                    'message': f'Insufficient quantity for product {requestProduct["name"]}'
-                }, 400
+                    'message': 'Request Data Not Found'
+                }, 404
+            return {
+                'message': 'Request Already Processed'
+            }, 409
+        forgetDocument('REQUEST', requestId)
 
-        # Decrease main product inventory using bulk write
-        decreaseInventoryQueries = [
-            UpdateOne(
-                {'_id': ObjectId(requestProduct['productId'])},
+        # check branch exists before taking any stock
+        branchId = ObjectId(requestAccepted['branch']['branchId'])
+        branchResponse = branchCollection.update_one({'_id': branchId}, {
+            '$set': {
+                'setup.updateDate': datetime.now(UTC),
+                'setup.updateUser': g.user['_id']
+            }
+        })
+        if not branchResponse.matched_count:
+            revertAcceptRequest(requestId, decreasedProducts)
+            return {
+                'message': 'Branch Data Not Found'
+            }, 404
+
+        # decrease main product inventory, the count guard keeps stock from going below zero
+        inventoryProducts = {}
+        for requestProduct in requestAccepted['product']:
+            inventoryProduct = productCollection.find_one_and_update(
+                {
+                    '_id': ObjectId(requestProduct['productId']),
+                    'count': {'$gte': requestProduct['quantity']}
+                },
                 {
                     '$inc': {'count': -requestProduct['quantity']},
                     '$set': {
                         'setup.updateDate': datetime.now(UTC),
                         'setup.updateUser': g.user['_id']
                     }
-                }
-            ) for requestProduct in requestData['product']
-        ]
-        productCollection.bulk_write(decreaseInventoryQueries)
+                },
+                {'vendor': 1, 'merk': 1, 'condition': 1, 'name': 1}
+            )
+            if not inventoryProduct:
+                revertAcceptRequest(requestId, decreasedProducts)
+                return {
+                    'message': f'Insufficient quantity for product {requestProduct["name"]}'
+                }, 400
 
-        # check product in branch
-        branchId = ObjectId(requestData['branch']['branchId'])
-        branchProductIds = branchCollection.find_one({'_id': branchId}, {'_id': 0, 'product.productId': 1})
-        branchProductIds = [product['productId'] for product in branchProductIds['product']]
-        # filter product that already in branch
-        newProductIds = [product['productId'] for product in requestData['product'] if product['productId'] not in branchProductIds]
+            decreasedProducts.append(requestProduct)
+            forgetDocument('PRODUCT', requestProduct['productId'])
+            inventoryProducts[requestProduct['productId']] = inventoryProduct
 
-        # insert new products to branch
-        createBranchProductQueries = [
-            UpdateOne(
-                {'_id': branchId},
-                {
-                    '$push': {
-                        'product': {
-                            'productId': newProductId,
-                            'name': inventoryProducts[newProductId]['name'],
-                            'count': next(
-                                request['quantity'] 
-                                for request in requestData['product'] 
-                                if request['productId'] == newProductId
-                            ),
-                            'vendor': inventoryProducts[newProductId]['vendor'],
-                            'merk': inventoryProducts[newProductId]['merk'],
-                            'condition': inventoryProducts[newProductId]['condition'],
-                            'setup': {
-                                'createDate': datetime.now(UTC),
-                                'updateDate': datetime.now(UTC),
-                                'createUser': g.user['_id'],
-                                'updateUser': g.user['_id']
-                            }
-                        }
-                    }
+        # add products to branch, an ordered write that fails part way is undone up to the failed write
+        try:
+            branchProductCollection.bulk_write([
+                buildUpsertBranchProductQuery(
+                    branchId,
+                    requestProduct['productId'],
+                    requestProduct['quantity'],
+                    inventoryProducts[requestProduct['productId']]
+                ) for requestProduct in requestAccepted['product']
+            ])
+        except BulkWriteError as e:
+            undoBranchProductQueries = buildUndoBranchProductQueries([
+                (branchId, requestProduct['productId'], requestProduct['quantity'])
+                for requestProduct in requestAccepted['product']
+            ], e.details)
+            raise
+        invalidateResponseCache('PRODUCT', 'VMS BRANCH', 'BRANCH PRODUCT')
+
+        return {
+            'data': requestAccepted
+        }, 200
+
+    except InvalidId:
+        # only the branch or product ids stored on the claimed request are parsed here
+        if requestAccepted:
+            revertAcceptRequest(requestId, decreasedProducts, undoBranchProductQueries)
+        abort(422, 'Invalid Request Data')
+    except WriteError as e:
+        if requestAccepted:
+            revertAcceptRequest(requestId, decreasedProducts, undoBranchProductQueries)
+        errorMessage = e.details.get('errmsg', str(e))
+        abort(422, errorMessage)
+    except Exception as e:
+        if requestAccepted:
+            revertAcceptRequest(requestId, decreasedProducts, undoBranchProductQueries)
+        abort(500, str(e))
+
+@verifyRole(['inventory'])
+def acceptRequests(requestIds: List[str]) -> tuple[dict, int]:
+    try:
+        requestObjectIds = list(dict.fromkeys(ObjectId(requestId) for requestId in requestIds))
+    except (InvalidId, TypeError):
+        abort(422, 'Invalid Request ID')
+
+    # marks every request claimed and every product decreased by this batch, a revert only touches what it marks
+    acceptBatchId = ObjectId()
+    claimedRequestIds = []
+    productDemand = {}
+    undoBranchProductQueries = []
+
+    try:
+        acceptedRequests, rejectedRequests, inventoryProducts = checkAcceptRequests(requestObjectIds)
+        if not acceptedRequests:
+            return {
+                'data': {
+                    'accepted': [],
+                    'rejected': rejectedRequests
                 }
-            ) for newProductId in newProductIds
+            }, 200
+
+        # claim the requests, one accepted or rejected since it was read is reported as processed
+        requestResponse = requestCollection.update_many({
+            '_id': {'$in': [request['_id'] for request in acceptedRequests]},
+            'status': 'on request'
+        }, {
+            '$set': {
+                'status': 'accepted',
+                'acceptBatchId': acceptBatchId,
+                'setup.updateDate': datetime.now(UTC),
+                'setup.updateUser': g.user['_id']
+            }
+        })
+        if requestResponse.matched_count == len(acceptedRequests):
+            claimedRequestIds = [request['_id'] for request in acceptedRequests]
+        else:
+            claimedRequestIds = [
+                request['_id'] for request in requestCollection.find({'acceptBatchId': acceptBatchId}, {'_id': 1})
+            ]
+        claimedRequests = [request for request in acceptedRequests if request['_id'] in claimedRequestIds]
+        rejectedRequests += [
+            {'requestId': str(request['_id']), 'message': 'Request Already Processed'}
+            for request in acceptedRequests if request['_id'] not in claimedRequestIds
         ]
-        if createBranchProductQueries:
-            branchCollection.bulk_write(createBranchProductQueries)
+        for requestId in claimedRequestIds:
+            forgetDocument('REQUEST', str(requestId))
+        if not claimedRequests:
+            return {
+                'data': {
+                    'accepted': [],
+                    'rejected': rejectedRequests
+                }
+            }, 200
+
+        branchProductDemand = {}
+        for request in claimedRequests:
+            branchId = ObjectId(request['branch']['branchId'])
+            for requestProduct in request['product']:
+                productId = requestProduct['productId']
+                productDemand[productId] = productDemand.get(productId, 0) + requestProduct['quantity']
+                branchProductDemand[(branchId, productId)] = branchProductDemand.get((branchId, productId), 0) + requestProduct['quantity']
 
-        # update product in branch
-        updateBranchProductQueries = [
+        # decrease main product inventory, the count guard keeps stock from going below zero
+        productResponse = productCollection.bulk_write([
             UpdateOne(
-                {'_id': branchId, 'product.productId': requestProduct['productId']},
+                {'_id': ObjectId(productId), 'count': {'$gte': quantity}},
                 {
-                    '$inc': {'product.$.count': requestProduct['quantity']},
+                    '$inc': {'count': -quantity},
+                    '$push': {'acceptBatchIds': acceptBatchId},
                     '$set': {
-                        'product.$.setup.updateDate': datetime.now(UTC),
-                        'product.$.setup.updateUser': g.user['_id']
+                        'setup.updateDate': datetime.now(UTC),
+                        'setup.updateUser': g.user['_id']
                     }
                 }
-            ) for requestProduct in requestData['product'] if requestProduct['productId'] not in newProductIds
+            ) for productId, quantity in productDemand.items()
+        ], ordered=False)
+        for productId in productDemand:
+            forgetDocument('PRODUCT', productId)
+        if productResponse.matched_count != len(productDemand):
+            revertAcceptBatch(acceptBatchId, productDemand)
+            return {
+                'message': 'Product stock changed during batch acceptance, please retry'
+            }, 409
+
+        # add products to branches, an ordered write that fails part way is undone up to the failed write
+        branchProducts = [
+            (branchId, productId, quantity)
+            for (branchId, productId), quantity in branchProductDemand.items()
         ]
-        if updateBranchProductQueries:
-            branchCollection.bulk_write(updateBranchProductQueries)
+        try:
+            branchProductCollection.bulk_write([
+                buildUpsertBranchProductQuery(
+                    branchId,
+                    productId,
+                    quantity,
+                    inventoryProducts[productId]
+                ) for branchId, productId, quantity in branchProducts
+            ])
+        except BulkWriteError as e:
+            undoBranchProductQueries = buildUndoBranchProductQueries(branchProducts, e.details)
+            raise
+        productCollection.bulk_write(buildReleaseAcceptBatchQueries(acceptBatchId, list(productDemand)))
+        invalidateResponseCache('PRODUCT', 'VMS BRANCH', 'BRANCH PRODUCT')
 
-        # update request data
-        requestAccepted = requestCollection.find_one_and_update({
-            '_id': ObjectId(requestId)
+        return {
+            'data': {
+                'accepted': [str(requestId) for requestId in claimedRequestIds],
+                'rejected': rejectedRequests
+            }
+        }, 200
+    except WriteError as e:
+        if claimedRequestIds:
+            revertAcceptBatch(acceptBatchId, productDemand, undoBranchProductQueries)
+        errorMessage = e.details.get('errmsg', str(e))
+        abort(422, errorMessage)
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        if claimedRequestIds:
+            revertAcceptBatch(acceptBatchId, productDemand, undoBranchProductQueries)
+        abort(500, str(e))
+
+# helper function
+def checkAcceptRequests(requestObjectIds: List[ObjectId]) -> tuple[List[dict], List[dict], dict[str, dict]]:
+    rejectedRequests = []
+    def rejectRequest(requestId: ObjectId, message: str):
+        rejectedRequests.append({'requestId': str(requestId), 'message': message})
+
+    requests = {
+        request['_id']: request
+        for request in requestCollection.find({'_id': {'$in': requestObjectIds}})
+    }
+    productIds = {
+        ObjectId(requestProduct['productId'])
+        for request in requests.values()
+        for requestProduct in request['product']
+    }
+    inventoryProducts = {
+        str(product['_id']): product
+        for product in productCollection.find(
+            {'_id': {'$in': list(productIds)}},
+            {'count': 1, 'vendor': 1, 'merk': 1, 'condition': 1, 'name': 1}
+        )
+    }
+    branchIds = {
+        branch['_id']
+        for branch in branchCollection.find(
+            {'_id': {'$in': list({ObjectId(request['branch']['branchId']) for request in requests.values()})}},
+            {'_id': 1}
+        )
+    }
+
+    # check combined demand per product against stock, in request order
+    remainingStock = {productId: product['count'] for productId, product in inventoryProducts.items()}
+    acceptedRequests = []
+    for requestId in requestObjectIds:
+        request = requests.get(requestId)
+        if not request:
+            rejectRequest(requestId, 'Request Data Not Found')
+            continue
+        if request['status'] != 'on request':
+            rejectRequest(requestId, 'Request Already Processed')
+            continue
+        if ObjectId(request['branch']['branchId']) not in branchIds:
+            rejectRequest(requestId, 'Branch Data Not Found')
+            continue
+
+        insufficientProduct = next((
+            requestProduct for requestProduct in request['product']
+            if remainingStock.get(requestProduct['productId'], 0) < requestProduct['quantity']
+        ), None)
+        if insufficientProduct:
+            rejectRequest(requestId, f'Insufficient quantity for product {insufficientProduct["name"]}')
+            continue
+
+        for requestProduct in request['product']:
+            remainingStock[requestProduct['productId']] -= requestProduct['quantity']
+        acceptedRequests.append(request)
+
+    return acceptedRequests, rejectedRequests, inventoryProducts
+
+def buildReleaseAcceptBatchQueries(acceptBatchId: ObjectId, productIds: List[str]) -> List[UpdateMany]:
+    # drop the batch mark, the field goes away with the last pending batch
+    productObjectIds = [ObjectId(productId) for productId in productIds]
+    return [
+        UpdateMany({'_id': {'$in': productObjectIds}, 'acceptBatchIds': [acceptBatchId]}, {'$unset': {'acceptBatchIds': ''}}),
+        UpdateMany({'_id': {'$in': productObjectIds}, 'acceptBatchIds': acceptBatchId}, {'$pull': {'acceptBatchIds': acceptBatchId}})
+    ]
+
+def buildUpsertBranchProductQuery(branchId: ObjectId, productId: str, quantity: int, inventoryProduct: dict) -> UpdateOne:
+    return UpdateOne(
+        {'branchId': branchId, 'productId': productId},
+        {
+            '$inc': {'count': quantity},
+            '$set': {
+                'setup.updateDate': datetime.now(UTC),
+                'setup.updateUser': g.user['_id']
+            },
+            '$setOnInsert': {
+                'name': inventoryProduct['name'],
+                'nameLower': inventoryProduct['name'].lower(),
+                'vendor': inventoryProduct['vendor'],
+                'merk': inventoryProduct['merk'],
+                'condition': inventoryProduct['condition'],
+                'setup.createDate': datetime.now(UTC),
+                'setup.createUser': g.user['_id']
+            }
+        },
+        upsert=True
+    )
+
+def buildUndoBranchProductQueries(branchProducts: List[tuple[ObjectId, str, int]], details: dict) -> List[UpdateOne | DeleteOne]:
+    # an ordered bulk write applied every write before the first error
+    writeErrors = details.get('writeErrors') or []
+    appliedCount = writeErrors[0]['index'] if writeErrors else len(branchProducts)
+    upsertedIds = {upserted['index']: upserted['_id'] for upserted in details.get('upserted', [])}
+
+    return [
+        DeleteOne({'_id': upsertedIds[index]}) if index in upsertedIds else UpdateOne(
+            {'branchId': branchId, 'productId': productId},
+            {'$inc': {'count': -quantity}}
+        ) for index, (branchId, productId, quantity) in enumerate(branchProducts[:appliedCount])
+    ]
+
+def revertAcceptRequest(requestId: str, decreasedProducts: List[dict], undoBranchProductQueries: List[UpdateOne | DeleteOne] = None) -> None:
+    # compensate a failed accept: take back the branch stock, give the stock back and reopen the request
+    try:
+        if undoBranchProductQueries:
+            branchProductCollection.bulk_write(undoBranchProductQueries)
+
+        if decreasedProducts:
+            productCollection.bulk_write([
+                UpdateOne(
+                    {'_id': ObjectId(requestProduct['productId'])},
+                    {'$inc': {'count': requestProduct['quantity']}}
+                ) for requestProduct in decreasedProducts
+            ])
+
+        requestCollection.update_one({
+            '_id': ObjectId(requestId),
+            'status': 'accepted'
         }, {
             '$set': {
-                'status': 'accepted',
+                'status': 'on request',
                 'setup.updateDate': datetime.now(UTC),
                 'setup.updateUser': g.user['_id']
             }
-        }, return_document=True)
+        })
+    except Exception as e:
+        # the caller still answers with its own error, the stock needs a manual check
+        print(f'Warning: Failed revert accept request {requestId} - {str(e)}')
 
-        return {
-            'data': {**requestAccepted, '_id': str(requestAccepted['_id'])}
-        }, 200
+def revertAcceptBatch(acceptBatchId: ObjectId, productDemand: dict[str, int], undoBranchProductQueries: List[UpdateOne | DeleteOne] = None) -> None:
+    # same as revertAcceptRequest, only products and requests that carry the batch mark are given back or reopened
+    try:
+        if undoBranchProductQueries:
+            branchProductCollection.bulk_write(undoBranchProductQueries)
 
-    except WriteError as e:
-        errorMessage = e.details.get('errmsg', str(e))
-        abort(422, errorMessage)
+        if productDemand:
+            productCollection.bulk_write([
+                UpdateOne(
+                    {'_id': ObjectId(productId), 'acceptBatchIds': acceptBatchId},
+                    {'$inc': {'count': quantity}}
+                ) for productId, quantity in productDemand.items()
+            ] + buildReleaseAcceptBatchQueries(acceptBatchId, list(productDemand)))
+
+        requestCollection.update_many({
+            'acceptBatchId': acceptBatchId,
+            'status': 'accepted'
+        }, {
+            '$set': {
+                'status': 'on request',
+                'setup.updateDate': datetime.now(UTC),
+                'setup.updateUser': g.user['_id']
+            },
+            '$unset': {'acceptBatchId': ''}
+        })
     except Exception as e:
-        print(e)
-        abort(500, str(e))
\ No newline at end of file
+        # the caller still answers with its own error, the stock needs a manual check
+        print(f'Warning: Failed revert accept batch {acceptBatchId} - {str(e)}')
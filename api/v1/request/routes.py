@@ -1,13 +1,20 @@
 from flask import Blueprint, jsonify, request
 
-from api.v1.request.controller import acceptRequest, findAllRequest, findRequestById, insertRequest
+from api.v1.request.controller import acceptRequest, acceptRequests, findAllRequest, findRequestById, insertRequest, streamAllRequest
+from common.helpers.streaming import getStreamFormat, streamResponse
 
 
 requestRoutes = Blueprint('requestRoutes', __name__, url_prefix='/v1/request')
 
 @requestRoutes.route('', methods=['GET'])
 def getAllRequest():
-    data, status = findAllRequest()
+    params = request.args
+    streamFormat = getStreamFormat(params)
+    if streamFormat:
+        documents, status = streamAllRequest()
+        return streamResponse(documents, streamFormat), status
+
+    data, status = findAllRequest(params)
     return jsonify(data), status
 
 @requestRoutes.route('/<string:requestId>', methods=['GET'])
@@ -23,4 +30,9 @@ def createRequest():
 @requestRoutes.route('/<string:requestId>/accept', methods=['POST'])
 def acceptBranchRequest(requestId: str):
     data, status = acceptRequest(requestId)
+    return jsonify(data), status
+
+@requestRoutes.route('/accept-batch', methods=['POST'])
+def acceptBranchRequests():
+    data, status = acceptRequests(request.json)
     return jsonify(data), status
\ No newline at end of file
@@ -1,8 +1,11 @@
-from flask import Blueprint, send_file
+import hashlib
+import os
+from flask import Blueprint, Response, request
 from flask_swagger_ui import get_swaggerui_blueprint
 
 swagger_url = '/swagger'
 api_url = '/api/v1/swagger.json'
+swagger_path = os.path.join(os.path.dirname(__file__), 'swagger.json')
 
 swaggerui_blueprint = get_swaggerui_blueprint(
     swagger_url,
@@ -14,6 +17,13 @@ swaggerui_blueprint = get_swaggerui_blueprint(
 
 swagger_blueprint = Blueprint('swagger', __name__)
 
+# read once at import, the spec only changes with a deploy
+with open(swagger_path, 'rb') as swaggerFile:
+    swagger_json_bytes = swaggerFile.read()
+swagger_json_etag = hashlib.sha1(swagger_json_bytes).hexdigest()
+
 @swagger_blueprint.route('/api/v1/swagger.json')
 def swagger_json():
-    return send_file('api/v1/swagger.json')
+    response = Response(swagger_json_bytes, mimetype='application/json')
+    response.set_etag(swagger_json_etag)
+    return response.make_conditional(request)
@@ -2,12 +2,12 @@ from datetime import UTC, datetime
 from api.v1.branch.controller import findBranchById
 from common.helpers.types import TypeUserInput
 from common.db import dbInstance
-import bcrypt
+from common.helpers.passwords import hashPassword
 from flask import abort, g
 from werkzeug.exceptions import HTTPException
 from pymongo.errors import WriteError
 
-userCollection = dbInstance.db['USER']
+userCollection = dbInstance.collection('USER')
 def insertUser(userInput: TypeUserInput):
     try:
         # check if username already exists
@@ -17,9 +17,7 @@ def insertUser(userInput: TypeUserInput):
         if anotherUserData:
             abort(409, 'Username already exists')
 
-        salt = bcrypt.gensalt()
-        hashedPassword = bcrypt.hashpw(userInput['password'].encode(), salt)
-        userInput['password'] = hashedPassword
+        userInput['password'] = hashPassword(userInput['password'])
 
         userData = {
             **userInput,
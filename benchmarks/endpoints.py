@@ -0,0 +1,364 @@
+import argparse
+import importlib
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import UTC, datetime
+from typing import Any, Callable, List
+from flask import Flask, g, has_request_context
+from flask.testing import FlaskClient
+
+# usage: python -m benchmarks.endpoints --backend mongomock --sizes 100,1000 --iterations 200
+#        python -m benchmarks.endpoints --backend mongod --mongo-uri mongodb://localhost:27017 --db benchmark
+#        python -m benchmarks.endpoints --compare benchmarks/results/before.json benchmarks/results/after.json
+#        python -m benchmarks.endpoints --startup-only --startup-runs 5
+
+TypeScenario = dict[str, Any]
+
+def pick(items:List[str], index:int) -> str:
+    return items[index % len(items)]
+
+# every blueprint, path and body are built from the seeded dataset and the iteration number
+scenarios: List[TypeScenario] = [
+    {'name': 'auth.login', 'role': None, 'method': 'POST', 'path': lambda data, index: '/v1/auth/login', 'json': lambda data, index: {'username': data['inventoryUsername'], 'password': data['password']}},
+    {'name': 'auth.user', 'role': 'inventory', 'method': 'GET', 'path': lambda data, index: '/v1/auth/user'},
+    {'name': 'bank.list', 'role': 'inventory', 'method': 'GET', 'path': lambda data, index: '/v1/bank'},
+    {'name': 'bank.byId', 'role': 'inventory', 'method': 'GET', 'path': lambda data, index: f'/v1/bank/{pick(data["bankIds"], index)}'},
+    {'name': 'vendor.list', 'role': 'inventory', 'method': 'GET', 'path': lambda data, index: '/v1/vendor'},
+    {'name': 'vendor.listAll', 'role': 'inventory', 'method': 'GET', 'path': lambda data, index: '/v1/vendor?all=true'},
+    {'name': 'vendor.byId', 'role': 'inventory', 'method': 'GET', 'path': lambda data, index: f'/v1/vendor/{pick(data["vendorIds"], index)}'},
+    {'name': 'vendor.updateDetail', 'role': 'inventory', 'method': 'PUT', 'path': lambda data, index: f'/v1/vendor/{pick(data["vendorIds"], index)}/detail', 'json': lambda data, index: {'vendorName': f'vendor {index % len(data["vendorIds"])}', 'address': f'Jl. Benchmark {index}'}},
+    {'name': 'product.list', 'role': 'inventory', 'method': 'GET', 'path': lambda data, index: '/v1/product'},
+    {'name': 'product.listAll', 'role': 'inventory', 'method': 'GET', 'path': lambda data, index: '/v1/product?all=true'},
+    {'name': 'product.byId', 'role': 'inventory', 'method': 'GET', 'path': lambda data, index: f'/v1/product/{pick(data["productIds"], index)}'},
+    {'name': 'product.bulk', 'role': 'inventory', 'method': 'POST', 'path': lambda data, index: '/v1/product/bulk', 'json': lambda data, index: [pick(data['productIds'], index + offset) for offset in range(20)]},
+    {'name': 'request.list', 'role': 'inventory', 'method': 'GET', 'path': lambda data, index: '/v1/request'},
+    {'name': 'request.byId', 'role': 'inventory', 'method': 'GET', 'path': lambda data, index: f'/v1/request/{pick(data["requestIds"], index)}'},
+    {'name': 'request.accept', 'role': 'inventory', 'method': 'POST', 'path': lambda data, index: f'/v1/request/{data["pendingRequestIds"][index]}/accept', 'limit': lambda data: len(data['pendingRequestIds'])},
+    {'name': 'branch.list', 'role': 'inventory', 'method': 'GET', 'path': lambda data, index: '/v1/branch'},
+    {'name': 'branch.listProduct', 'role': 'inventory', 'method': 'GET', 'path': lambda data, index: '/v1/branch?product=true'},
+    {'name': 'branch.byId', 'role': 'inventory', 'method': 'GET', 'path': lambda data, index: f'/v1/branch/{pick(data["branchIds"], index)}'},
+    {'name': 'branch.user', 'role': 'branch', 'method': 'GET', 'path': lambda data, index: '/v1/branch/user'},
+    {'name': 'branch.userProduct', 'role': 'branch', 'method': 'GET', 'path': lambda data, index: '/v1/branch/user/product'},
+    {'name': 'branch.userProductById', 'role': 'branch', 'method': 'GET', 'path': lambda data, index: f'/v1/branch/user/product/{pick(data["branchProductIds"], index)}'},
+    {'name': 'branch.updateUserProduct', 'role': 'branch', 'method': 'PUT', 'path': lambda data, index: f'/v1/branch/user/product/{pick(data["branchProductIds"], index)}', 'json': lambda data, index: {'count': index % 100}},
+    {'name': 'branch.updateUserProductBulk', 'role': 'branch', 'method': 'PUT', 'path': lambda data, index: '/v1/branch/user/product/bulk', 'json': lambda data, index: [{'productId': pick(data['branchProductIds'], index + offset), 'count': index % 100} for offset in range(20)]},
+    {'name': 'request.insert', 'role': 'branch', 'method': 'POST', 'path': lambda data, index: '/v1/request', 'json': lambda data, index: {'product': [{'productId': pick(data['productIds'], index), 'quantity': 1}]}},
+    {'name': 'request.listBranch', 'role': 'branch', 'method': 'GET', 'path': lambda data, index: '/v1/request'}
+]
+
+def loadApp(args:argparse.Namespace) -> tuple[Flask, Any]:
+    # config is read at import, so the environment has to be in place before the app is imported
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ.setdefault('REDIS_URL', 'redis://localhost:6379/0')
+    os.environ['MONGODB_URI'] = args.mongo_uri
+    os.environ['MONGODB_DB'] = args.db
+    os.environ['MONGO_COMMAND_HEADER'] = 'true'
+    os.environ['MONGODB_ENSURE_INDEXES'] = 'false'
+    # the seeded hashes use this cost, a different app cost would rehash on every login
+    os.environ['BCRYPT_ROUNDS'] = str(args.bcrypt_rounds)
+
+    databaseModule = importlib.import_module('common.db')
+    if args.backend == 'mongomock':
+        mongomock = importlib.import_module('mongomock')
+        databaseModule.dbInstance.client = mongomock.MongoClient()
+        databaseModule.dbInstance.db = databaseModule.dbInstance.client[args.db]
+        countMongomockCommands(mongomock)
+
+    app = importlib.import_module('main').app
+    return app, databaseModule.dbInstance.db
+
+def countMongomockCommands(mongomock:Any) -> None:
+    # mongomock does not emit command events, count the collection calls that would be round trips instead
+    # find_one and friends call find internally, only the outermost call of a thread is a round trip
+    callDepth = threading.local()
+
+    def countCommand(method:Callable) -> Callable:
+        def countedMethod(*args, **kwargs):
+            depth = getattr(callDepth, 'value', 0)
+            if not depth and has_request_context():
+                g.mongoCommands = g.get('mongoCommands', 0) + 1
+            callDepth.value = depth + 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                callDepth.value = depth
+        return countedMethod
+
+    for methodName in [
+        'find', 'find_one', 'aggregate', 'count_documents', 'insert_one', 'insert_many', 'update_one',
+        'update_many', 'delete_one', 'delete_many', 'find_one_and_update', 'bulk_write'
+    ]:
+        setattr(mongomock.Collection, methodName, countCommand(getattr(mongomock.Collection, methodName)))
+
+def createClient(app:Flask, data:dict, role:str | None) -> FlaskClient:
+    client = app.test_client()
+    # session cookies are secure only
+    client.environ_base['wsgi.url_scheme'] = 'https'
+    if role:
+        username = data['inventoryUsername'] if role == 'inventory' else data['branchUsername']
+        response = client.post('/v1/auth/login', json={'username': username, 'password': data['password']})
+        if response.status_code != 200:
+            raise RuntimeError(f'Login as {username} failed with {response.status_code}')
+    return client
+
+def percentile(sortedValues:List[float], rank:float) -> float:
+    if not sortedValues:
+        return 0.0
+    # nearest rank
+    index = max(0, math.ceil(rank / 100 * len(sortedValues)) - 1)
+    return sortedValues[index]
+
+def runScenario(app:Flask, data:dict, scenario:TypeScenario, iterations:int, concurrency:int, warmup:int) -> dict[str, Any]:
+    if 'limit' in scenario:
+        iterations = min(iterations, scenario['limit'](data))
+    if iterations <= 0:
+        return None
+
+    latencies = []
+    mongoCommands = []
+    statusCodes = {}
+    indexLock = threading.Lock()
+    nextIndex = [0]
+
+    def request(client:FlaskClient, index:int):
+        requestStart = time.perf_counter()
+        response = client.open(
+            scenario['path'](data, index),
+            method=scenario['method'],
+            json=scenario['json'](data, index) if 'json' in scenario else None
+        )
+        response.get_data()
+        return time.perf_counter() - requestStart, response
+
+    def worker():
+        client = createClient(app, data, scenario['role'])
+        while True:
+            with indexLock:
+                index = nextIndex[0]
+                nextIndex[0] += 1
+            if index >= iterations:
+                return
+            duration, response = request(client, index)
+            with indexLock:
+                latencies.append(duration)
+                mongoCommands.append(int(response.headers.get('X-Mongo-Commands', 0)))
+                statusCodes[response.status_code] = statusCodes.get(response.status_code, 0) + 1
+
+    # warm up caches and lazy imports outside of the measurement, writes with their own index range
+    if 'limit' not in scenario:
+        warmupClient = createClient(app, data, scenario['role'])
+        for index in range(warmup):
+            request(warmupClient, iterations + index)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    startTime = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - startTime
+
+    sortedLatencies = sorted(latency * 1000 for latency in latencies)
+    return {
+        'endpoint': scenario['name'],
+        'method': scenario['method'],
+        'role': scenario['role'],
+        'count': len(sortedLatencies),
+        'errors': sum(count for statusCode, count in statusCodes.items() if statusCode >= 400),
+        'statusCodes': {str(statusCode): count for statusCode, count in sorted(statusCodes.items())},
+        'p50Ms': round(percentile(sortedLatencies, 50), 3),
+        'p95Ms': round(percentile(sortedLatencies, 95), 3),
+        'p99Ms': round(percentile(sortedLatencies, 99), 3),
+        'meanMs': round(sum(sortedLatencies) / len(sortedLatencies), 3),
+        'throughput': round(len(sortedLatencies) / elapsed, 2) if elapsed else 0,
+        'mongoCommandsPerRequest': round(sum(mongoCommands) / len(mongoCommands), 2)
+    }
+
+# a fresh interpreter imports the app and serves one request, what a cold container pays before its first response
+startupScript = '''
+import json, time
+startTime = time.perf_counter()
+import main
+importedTime = time.perf_counter()
+response = main.app.test_client().get('/api/v1/swagger.json')
+response.get_data()
+print(json.dumps({'importMs': (importedTime - startTime) * 1000, 'firstResponseMs': (time.perf_counter() - startTime) * 1000, 'status': response.status_code}))
+'''
+
+def parseImportTime(output:str) -> List[dict]:
+    # lines look like: import time:  self [us] | cumulative | imported package
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        selfTime, cumulativeTime, moduleName = line[len('import time:'):].split('|')
+        modules.append({
+            'module': moduleName.strip(),
+            'depth': (len(moduleName) - len(moduleName.lstrip()) - 1) // 2,
+            'selfMs': int(selfTime) / 1000,
+            'cumulativeMs': int(cumulativeTime) / 1000
+        })
+    return modules
+
+def profileStartup(args:argparse.Namespace, runs:int, top:int) -> dict[str, Any]:
+    environment = {
+        **os.environ,
+        'SECRET_KEY': os.environ.get('SECRET_KEY', 'benchmark'),
+        'REDIS_URL': os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+        'MONGODB_URI': args.mongo_uri,
+        'MONGODB_DB': args.db,
+        'MONGODB_ENSURE_INDEXES': 'false'
+    }
+    measurements = []
+    modules = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', startupScript],
+            capture_output=True, text=True, env=environment, check=True
+        )
+        measurements.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        modules = parseImportTime(completed.stderr)
+
+    # the heaviest modules imported directly by main, each with everything it pulls in
+    # children are listed before their parent, so collect depth 1 lines until main closes them
+    mainImports = []
+    directImports = []
+    for module in modules:
+        if module['depth'] == 1:
+            directImports.append(module)
+        elif module['depth'] == 0:
+            if module['module'] == 'main':
+                mainImports = directImports
+            directImports = []
+    mainImports.sort(key=lambda module: module['cumulativeMs'], reverse=True)
+    importMs = sorted(measurement['importMs'] for measurement in measurements)
+    firstResponseMs = sorted(measurement['firstResponseMs'] for measurement in measurements)
+    return {
+        'runs': runs,
+        'lazyStartup': environment.get('LAZY_STARTUP', 'false'),
+        'importMsP50': round(percentile(importMs, 50), 3),
+        'firstResponseMsP50': round(percentile(firstResponseMs, 50), 3),
+        'firstResponseMsMax': round(firstResponseMs[-1], 3),
+        'topImports': [
+            {'module': module['module'], 'cumulativeMs': module['cumulativeMs'], 'selfMs': module['selfMs']}
+            for module in mainImports[:top]
+        ]
+    }
+
+def printStartup(startup:dict) -> None:
+    print(f'\nstartup ({startup["runs"]} runs, LAZY_STARTUP={startup["lazyStartup"]})')
+    print(f'import main p50 {startup["importMsP50"]:.1f} ms, first response p50 {startup["firstResponseMsP50"]:.1f} ms, max {startup["firstResponseMsMax"]:.1f} ms')
+    print(f'{"module":<40} {"cumulative ms":>14} {"self ms":>9}')
+    for module in startup['topImports']:
+        print(f'{module["module"]:<40} {module["cumulativeMs"]:>14.1f} {module["selfMs"]:>9.1f}')
+
+def printResults(size:int, results:List[dict]) -> None:
+    print(f'\nsize {size}')
+    print(f'{"endpoint":<30} {"n":>6} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"req/s":>9} {"mongo":>6} {"errors":>6}')
+    for result in results:
+        print(
+            f'{result["endpoint"]:<30} {result["count"]:>6} {result["p50Ms"]:>9.2f} {result["p95Ms"]:>9.2f} '
+            f'{result["p99Ms"]:>9.2f} {result["throughput"]:>9.1f} {result["mongoCommandsPerRequest"]:>6.1f} {result["errors"]:>6}'
+        )
+
+def compareResults(baselinePath:str, currentPath:str) -> None:
+    with open(baselinePath) as baselineFile:
+        baseline = json.load(baselineFile)
+    with open(currentPath) as currentFile:
+        current = json.load(currentFile)
+
+    if baseline.get('startup') and current.get('startup'):
+        print(f'first response p50 {baseline["startup"]["firstResponseMsP50"]:.1f} ms -> {current["startup"]["firstResponseMsP50"]:.1f} ms\n')
+
+    baselineResults = {(result['size'], result['endpoint']): result for result in baseline['results']}
+    print(f'{"size":>7} {"endpoint":<30} {"p95 before":>11} {"p95 after":>10} {"change":>8} {"mongo":>11}')
+    for result in current['results']:
+        before = baselineResults.get((result['size'], result['endpoint']))
+        if not before:
+            continue
+        change = (result['p95Ms'] - before['p95Ms']) / before['p95Ms'] * 100 if before['p95Ms'] else 0
+        print(
+            f'{result["size"]:>7} {result["endpoint"]:<30} {before["p95Ms"]:>11.2f} {result["p95Ms"]:>10.2f} '
+            f'{change:>+7.1f}% {before["mongoCommandsPerRequest"]:>5.1f}->{result["mongoCommandsPerRequest"]:<5.1f}'
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every endpoint through the flask test client')
+    parser.add_argument('--backend', choices=['mongomock', 'mongod'], default='mongomock')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017')
+    parser.add_argument('--db', default='benchmark')
+    parser.add_argument('--sizes', default='100,1000')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--bcrypt-rounds', type=int, default=10)
+    parser.add_argument('--endpoints', help='comma separated endpoint names, default every endpoint')
+    parser.add_argument('--output', help='result file, default benchmarks/results/endpoints-<timestamp>.json')
+    parser.add_argument('--startup-runs', type=int, default=3, help='fresh interpreters started to time import and first response, 0 to skip')
+    parser.add_argument('--startup-top', type=int, default=15)
+    parser.add_argument('--startup-only', action='store_true')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help='compare two result files and exit')
+    args = parser.parse_args()
+
+    if args.compare:
+        compareResults(*args.compare)
+        return
+
+    # measured before loadApp, in a clean interpreter
+    startup = profileStartup(args, args.startup_runs, args.startup_top) if args.startup_runs > 0 or args.startup_only else None
+    if startup:
+        printStartup(startup)
+    if args.startup_only:
+        return
+
+    app, database = loadApp(args)
+    seedModule = importlib.import_module('benchmarks.seed')
+    cacheModule = importlib.import_module('common.helpers.cache')
+    selectedScenarios = [
+        scenario for scenario in scenarios
+        if not args.endpoints or scenario['name'] in args.endpoints.split(',')
+    ]
+
+    results = []
+    for size in [int(size) for size in args.sizes.split(',')]:
+        seedModule.clearDataset(database)
+        data = seedModule.seedDataset(database, size, args.seed, args.bcrypt_rounds)
+        if args.backend == 'mongod':
+            importlib.import_module('common.indexes').ensureIndexes()
+
+        sizeResults = []
+        for scenario in selectedScenarios:
+            for cache in cacheModule.caches.values():
+                cache.clear()
+            result = runScenario(app, data, scenario, args.iterations, args.concurrency, args.warmup)
+            if result:
+                sizeResults.append({'size': size, **result})
+        printResults(size, sizeResults)
+        results += sizeResults
+
+    outputPath = args.output or os.path.join('benchmarks', 'results', f'endpoints-{datetime.now(UTC):%Y%m%d-%H%M%S}.json')
+    os.makedirs(os.path.dirname(outputPath) or '.', exist_ok=True)
+    with open(outputPath, 'w') as outputFile:
+        json.dump({
+            'meta': {
+                'timestamp': datetime.now(UTC).isoformat(),
+                'backend': args.backend,
+                'iterations': args.iterations,
+                'concurrency': args.concurrency,
+                'seed': args.seed,
+                'python': platform.python_version()
+            },
+            'startup': startup,
+            'results': results
+        }, outputFile, indent=2)
+    print(f'\nresults saved to {outputPath}')
+
+if __name__ == '__main__':
+    main()
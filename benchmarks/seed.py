@@ -0,0 +1,211 @@
+import argparse
+import random
+from datetime import UTC, datetime, timedelta
+from typing import Any
+import bcrypt
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.database import Database
+
+# usage: python -m benchmarks.seed --mongo-uri mongodb://localhost:27017 --db benchmark --size 1000
+
+benchmarkPassword = 'benchmark'
+collectionNames = ['USER', 'VMS BANK', 'VMS VENDOR', 'PRODUCT', 'VMS BRANCH', 'BRANCH PRODUCT', 'REQUEST']
+
+def buildSetup(createDate:datetime) -> dict:
+    return {
+        'createDate': createDate,
+        'updateDate': createDate,
+        'createUser': 'benchmark',
+        'updateUser': 'benchmark'
+    }
+
+def getDatasetCounts(size:int) -> dict[str, int]:
+    # every collection grows with size, branches and vendors slower than products and requests
+    return {
+        'banks': max(5, size // 100),
+        'vendors': max(5, size // 10),
+        'products': size,
+        'branches': max(2, size // 50),
+        'branchProducts': min(size, 200),
+        'requests': size
+    }
+
+def clearDataset(database:Database) -> None:
+    for collectionName in collectionNames:
+        database[collectionName].delete_many({})
+
+def seedDataset(database:Database, size:int, seed:int = 42, bcryptRounds:int = 10) -> dict[str, Any]:
+    rng = random.Random(seed)
+    counts = getDatasetCounts(size)
+    baseDate = datetime(2024, 1, 1, tzinfo=UTC)
+
+    banks = [{
+        '_id': ObjectId(),
+        'name': f'Bank {index}',
+        'bankDesc': f'bank {index}',
+        'activeStatus': True,
+        'setup': buildSetup(baseDate)
+    } for index in range(counts['banks'])]
+
+    vendors = [{
+        '_id': ObjectId(),
+        'vendorName': f'vendor {index}',
+        'unitUsaha': rng.choice(['PT', 'CV', 'UD']),
+        'address': f'Jl. Benchmark {index}',
+        'country': 'Indonesia',
+        'province': rng.choice(['DKI Jakarta', 'Jawa Barat', 'Banten']),
+        'noTelp': f'08{rng.randint(100000000, 999999999)}',
+        'emailCompany': f'vendor{index}@benchmark.test',
+        'website': f'https://vendor{index}.benchmark.test',
+        'noNPWP': str(rng.randint(10 ** 14, 10 ** 15 - 1)),
+        'branchOffice': [{
+            'branchName': f'Office {index}-{office}',
+            'address': f'Jl. Cabang {office}',
+            'country': 'Indonesia',
+            'noTelp': f'021{rng.randint(1000000, 9999999)}',
+            'website': f'https://vendor{index}.benchmark.test',
+            'email': f'office{office}@vendor{index}.benchmark.test'
+        } for office in range(rng.randint(1, 5))],
+        'pic': [{
+            'name': f'PIC {index}-{pic}',
+            'email': f'pic{pic}@vendor{index}.benchmark.test',
+            'noTelp': f'08{rng.randint(100000000, 999999999)}'
+        } for pic in range(rng.randint(1, 5))],
+        'accountBank': [{
+            'bankId': str(bank['_id']),
+            'bankName': bank['name'],
+            'accountNumber': str(rng.randint(10 ** 9, 10 ** 10 - 1)),
+            'accountName': f'vendor {index}'
+        } for bank in rng.sample(banks, rng.randint(1, 3))],
+        'activeStatus': True,
+        'setup': buildSetup(baseDate)
+    } for index in range(counts['vendors'])]
+
+    products = []
+    for index in range(counts['products']):
+        vendor = rng.choice(vendors)
+        products.append({
+            '_id': ObjectId(),
+            'name': f'Product {index:07d}',
+            'count': 10 ** 6,
+            'merk': rng.choice(['Indomie', 'Aqua', 'Sari Roti', 'Ultra', 'Chitato']),
+            'condition': rng.choice(['good', 'bad']),
+            'vendor': {
+                'vendorId': str(vendor['_id']),
+                'vendorName': vendor['vendorName']
+            },
+            'activeStatus': True,
+            'setup': buildSetup(baseDate + timedelta(minutes=index))
+        })
+
+    branches = [{
+        '_id': ObjectId(),
+        'branchName': f'Branch {index}',
+        'activeStatus': True,
+        'setup': buildSetup(baseDate)
+    } for index in range(counts['branches'])]
+
+    branchProducts = []
+    for branch in branches:
+        for product in rng.sample(products, counts['branchProducts']):
+            branchProducts.append({
+                'branchId': branch['_id'],
+                'productId': str(product['_id']),
+                'name': product['name'],
+                'nameLower': product['name'].lower(),
+                'count': rng.randint(0, 100),
+                'merk': product['merk'],
+                'condition': product['condition'],
+                'vendor': product['vendor'],
+                'setup': buildSetup(baseDate)
+            })
+
+    requests = []
+    for index in range(counts['requests']):
+        branch = rng.choice(branches)
+        requestProducts = rng.sample(products, rng.randint(1, 5))
+        requests.append({
+            '_id': ObjectId(),
+            'product': [{
+                'productId': str(product['_id']),
+                'name': product['name'],
+                'quantity': rng.randint(1, 10)
+            } for product in requestProducts],
+            'status': 'on request' if index % 2 == 0 else 'accepted',
+            'branch': {
+                'branchName': branch['branchName'],
+                'branchId': str(branch['_id'])
+            },
+            'totalProduct': len(requestProducts),
+            'setup': buildSetup(baseDate + timedelta(minutes=index))
+        })
+
+    # every user shares one hash, hashing per user would dominate the seed time
+    hashedPassword = bcrypt.hashpw(benchmarkPassword.encode(), bcrypt.gensalt(bcryptRounds))
+    users = [{
+        '_id': ObjectId(),
+        'username': 'inventory',
+        'password': hashedPassword,
+        'userRole': 'inventory',
+        'setup': buildSetup(baseDate)
+    }] + [{
+        '_id': ObjectId(),
+        'username': f'branch{index}',
+        'password': hashedPassword,
+        'userRole': 'branch',
+        'branch': {
+            'branchName': branch['branchName'],
+            'branchId': str(branch['_id'])
+        },
+        'setup': buildSetup(baseDate)
+    } for index, branch in enumerate(branches)]
+
+    for collectionName, documents in [
+        ('VMS BANK', banks),
+        ('VMS VENDOR', vendors),
+        ('PRODUCT', products),
+        ('VMS BRANCH', branches),
+        ('BRANCH PRODUCT', branchProducts),
+        ('REQUEST', requests),
+        ('USER', users)
+    ]:
+        if documents:
+            database[collectionName].insert_many(documents)
+
+    firstBranchId = str(branches[0]['_id'])
+    return {
+        'size': size,
+        'counts': {**counts, 'branchProducts': len(branchProducts), 'users': len(users)},
+        'bankIds': [str(bank['_id']) for bank in banks],
+        'vendorIds': [str(vendor['_id']) for vendor in vendors],
+        'productIds': [str(product['_id']) for product in products],
+        'branchIds': [str(branch['_id']) for branch in branches],
+        'requestIds': [str(request['_id']) for request in requests],
+        'pendingRequestIds': [str(request['_id']) for request in requests if request['status'] == 'on request'],
+        'branchProductIds': [
+            branchProduct['productId'] for branchProduct in branchProducts
+            if str(branchProduct['branchId']) == firstBranchId
+        ],
+        'inventoryUsername': 'inventory',
+        'branchUsername': 'branch0',
+        'password': benchmarkPassword
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed a database with synthetic data for the benchmarks')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017')
+    parser.add_argument('--db', default='benchmark')
+    parser.add_argument('--size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--bcrypt-rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    database = MongoClient(args.mongo_uri)[args.db]
+    clearDataset(database)
+    dataset = seedDataset(database, args.size, args.seed, args.bcrypt_rounds)
+    for name, count in dataset['counts'].items():
+        print(f'{name:>15}: {count}')
+
+if __name__ == '__main__':
+    main()
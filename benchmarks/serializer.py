@@ -0,0 +1,73 @@
+import argparse
+import random
+import timeit
+from datetime import UTC, datetime, timedelta
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from common.helpers.jsonProvider import OrjsonProvider
+
+# usage: python -m benchmarks.serializer --size 10000 --repeat 5
+
+def generateProducts(size:int, seed:int) -> list[dict]:
+    rng = random.Random(seed)
+    createDate = datetime(2024, 1, 1, tzinfo=UTC)
+    return [{
+        '_id': ObjectId(),
+        'name': f'Product {index}',
+        'count': rng.randint(0, 500),
+        'merk': rng.choice(['Indomie', 'Aqua', 'Sari Roti', 'Ultra']),
+        'condition': rng.choice(['good', 'bad']),
+        'vendor': {
+            'vendorId': str(ObjectId()),
+            'vendorName': f'Vendor {rng.randint(1, 50)}'
+        },
+        'activeStatus': True,
+        'setup': {
+            'createDate': createDate + timedelta(minutes=index),
+            'updateDate': createDate + timedelta(minutes=index),
+            'createUser': 'benchmark',
+            'updateUser': 'benchmark'
+        }
+    } for index in range(size)]
+
+def currentPath(app:Flask, products:list[dict]) -> bytes:
+    # copy every document to stringify _id, then serialize with the default provider
+    with app.app_context():
+        return app.json.response({
+            'data': [
+                {**product, '_id': str(product['_id'])}
+                for product in products
+            ]
+        }).get_data()
+
+def orjsonPath(app:Flask, products:list[dict]) -> bytes:
+    with app.app_context():
+        return app.json.response({'data': products}).get_data()
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the default flask JSON provider with OrjsonProvider')
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    products = generateProducts(args.size, args.seed)
+
+    defaultApp = Flask(__name__)
+    defaultApp.json = DefaultJSONProvider(defaultApp)
+    orjsonApp = Flask(__name__)
+    orjsonApp.json = OrjsonProvider(orjsonApp)
+
+    results = {
+        'default': min(timeit.repeat(lambda: currentPath(defaultApp, products), number=1, repeat=args.repeat)),
+        'orjson': min(timeit.repeat(lambda: orjsonPath(orjsonApp, products), number=1, repeat=args.repeat))
+    }
+
+    print(f'{args.size} products, best of {args.repeat}')
+    for name, seconds in results.items():
+        print(f'{name:>8}: {seconds * 1000:8.2f} ms')
+    print(f' speedup: {results["default"] / results["orjson"]:8.2f}x')
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,102 @@
-from pymongo import MongoClient 
+import os
+import threading
+from typing import Any
+from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.database import Database as MongoDatabase
+from pymongo.read_preferences import SecondaryPreferred
 from config import Config
+from common.listeners import commandCounter
+from common.slowQueries import slowQueryLog
 
+# the client is created on first use in every process, a client inherited through fork is never reused
 class Database:
     def __init__(self):
-        try:
-            self.db = {}
-            self.client = MongoClient(Config.MONGODB_URI)
-            self.db = self.client[Config.MONGODB_DB]
-        except Exception as e:
-            print(f'Error: Failed connect to database {e}')
+        self.pid: int | None = None
+        self._client: MongoClient | None = None
+        self._db: MongoDatabase | dict = {}
+        self.lock = threading.Lock()
 
-dbInstance = Database()
+    def connect(self) -> None:
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            try:
+                self._client = MongoClient(Config.MONGODB_URI, event_listeners=[commandCounter], **getClientOptions())
+                self._db = self._client[Config.MONGODB_DB]
+                self.pid = os.getpid()
+                slowQueryLog.client = self._client
+            except Exception as e:
+                print(f'Error: Failed connect to database {e}')
+
+    def close(self) -> None:
+        with self.lock:
+            if self._client is not None and self.pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._db = {}
+            self.pid = None
+
+    @property
+    def client(self) -> MongoClient:
+        if self.pid != os.getpid():
+            self.connect()
+        return self._client
+
+    @client.setter
+    def client(self, client:MongoClient) -> None:
+        self._client = client
+        self.pid = os.getpid()
+        slowQueryLog.client = client
+
+    @property
+    def db(self) -> MongoDatabase:
+        if self.pid != os.getpid():
+            self.connect()
+        return self._db
+
+    @db.setter
+    def db(self, db:MongoDatabase) -> None:
+        self._db = db
 
+    def collection(self, name:str, secondary:bool = False) -> 'LazyCollection':
+        return LazyCollection(self, name, secondary)
+
+# module level collections resolve against the current process client on every use
+# secondary collections serve list reads that tolerate lag, anything read back after a write stays on the primary
+class LazyCollection:
+    def __init__(self, database:Database, name:str, secondary:bool = False):
+        self._database = database
+        self._name = name
+        self._secondary = secondary and Config.MONGODB_SECONDARY_READS
+        self._collection: Collection | None = None
+
+    def resolve(self) -> Collection:
+        db = self._database.db
+        collection = self._collection
+        if collection is None or collection.database is not db:
+            collection = self._collection = db.get_collection(
+                self._name,
+                read_preference=SecondaryPreferred(max_staleness=Config.MONGODB_MAX_STALENESS_SECONDS) if self._secondary else None
+            )
+        return collection
+
+    def __getattr__(self, attr:str) -> Any:
+        return getattr(self.resolve(), attr)
+
+def getClientOptions() -> dict[str, Any]:
+    options = {
+        'maxPoolSize': Config.MONGODB_MAX_POOL_SIZE,
+        'minPoolSize': Config.MONGODB_MIN_POOL_SIZE,
+        'serverSelectionTimeoutMS': Config.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        'retryWrites': Config.MONGODB_RETRY_WRITES,
+        # server selection and monitoring start with the first operation
+        'connect': not Config.LAZY_STARTUP
+    }
+    if Config.MONGODB_MAX_IDLE_TIME_MS:
+        options['maxIdleTimeMS'] = Config.MONGODB_MAX_IDLE_TIME_MS
+    if Config.MONGODB_COMPRESSORS:
+        options['compressors'] = Config.MONGODB_COMPRESSORS
+    return options
+
+dbInstance = Database()
@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+from datetime import UTC, datetime
+from typing import Any
+import redis
+from common.db import dbInstance
+from common.redisCircuit import redisCircuit
+from config import Config
+
+# probes read the last snapshot, only the checker thread talks to mongo and redis
+class HealthChecker:
+    def __init__(self, intervalSeconds:float):
+        self.intervalSeconds = intervalSeconds
+        self.snapshot: dict[str, Any] = {
+            'ready': False,
+            'checkedAt': None,
+            'mongodb': {'status': 'Unknown', 'latencyMs': None},
+            'redis': {'status': 'Unknown', 'latencyMs': None, 'circuit': redisCircuit.state}
+        }
+        self.pid: int | None = None
+        self.lock = threading.Lock()
+        self.worker: threading.Thread | None = None
+
+    def start(self) -> None:
+        # threads do not survive fork, every process runs its own checker
+        if self.pid == os.getpid() and self.worker and self.worker.is_alive():
+            return
+        with self.lock:
+            if self.pid == os.getpid() and self.worker and self.worker.is_alive():
+                return
+            self.pid = os.getpid()
+            self.worker = threading.Thread(target=self.run, name='healthChecker', daemon=True)
+            self.worker.start()
+
+    def getSnapshot(self) -> dict[str, Any]:
+        self.start()
+        return self.snapshot
+
+    def run(self) -> None:
+        while True:
+            self.snapshot = self.check()
+            time.sleep(self.intervalSeconds)
+
+    def check(self) -> dict[str, Any]:
+        mongoStatus = checkMongo()
+        redisStatus = checkRedis()
+        return {
+            # sessions fall back to process memory, only mongo decides readiness
+            'ready': mongoStatus['status'] == 'Connected',
+            'checkedAt': datetime.now(UTC).isoformat(),
+            'mongodb': mongoStatus,
+            'redis': redisStatus
+        }
+
+def checkMongo() -> dict[str, Any]:
+    startTime = time.perf_counter()
+    try:
+        dbInstance.client.admin.command('ping')
+    except Exception as e:
+        return {'status': f'Error: {str(e)}', 'latencyMs': None}
+    return {'status': 'Connected', 'latencyMs': round((time.perf_counter() - startTime) * 1000, 3)}
+
+def checkRedis() -> dict[str, Any]:
+    if not redisCircuit.available():
+        return {'status': 'Error: Redis is not connected', 'latencyMs': None, 'circuit': redisCircuit.state}
+
+    startTime = time.perf_counter()
+    try:
+        redisCircuit.client.ping()
+    except redis.RedisError as e:
+        redisCircuit.recordFailure(e)
+        return {'status': 'Error: Redis is not connected', 'latencyMs': None, 'circuit': redisCircuit.state}
+    return {'status': 'Connected', 'latencyMs': round((time.perf_counter() - startTime) * 1000, 3), 'circuit': redisCircuit.state}
+
+healthChecker = HealthChecker(Config.HEALTH_CHECK_INTERVAL)
@@ -0,0 +1,61 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+# every cache registers itself here so its counters can be reported
+caches: dict[str, 'TTLCache'] = {}
+
+class TTLCache:
+    def __init__(self, name:str, maxSize:int, ttl:float):
+        self.name = name
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        caches[name] = self
+
+    def get(self, key:Hashable) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            value = entry[1]
+
+        # callers may modify the returned document
+        return copy.deepcopy(value)
+
+    def set(self, key:Hashable, value:Any) -> None:
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxSize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key:Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._data)
+        }
+
+def cacheStats() -> dict[str, dict[str, int]]:
+    return {name: cache.stats() for name, cache in caches.items()}
@@ -0,0 +1,27 @@
+from typing import Any, List
+
+def getPlanStages(plan:dict) -> List[str]:
+    stages = [plan.get('stage')]
+    if 'inputStage' in plan:
+        stages += getPlanStages(plan['inputStage'])
+    for inputStage in plan.get('inputStages', []):
+        stages += getPlanStages(inputStage)
+    return stages
+
+def getWinningPlan(queryPlanner:dict) -> dict:
+    # slot based engine nests the plan one level deeper
+    winningPlan = queryPlanner.get('winningPlan', {})
+    return winningPlan.get('queryPlan', winningPlan)
+
+def summarizeExplain(explainResult:dict) -> dict[str, Any]:
+    stages = getPlanStages(getWinningPlan(explainResult.get('queryPlanner', {})))
+    executionStats = explainResult.get('executionStats', {})
+
+    return {
+        'stages': stages,
+        'collscan': 'COLLSCAN' in stages,
+        'docsExamined': executionStats.get('totalDocsExamined'),
+        'keysExamined': executionStats.get('totalKeysExamined'),
+        'returned': executionStats.get('nReturned'),
+        'executionTimeMillis': executionStats.get('executionTimeMillis')
+    }
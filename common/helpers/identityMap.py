@@ -0,0 +1,29 @@
+from copy import deepcopy
+from typing import Any
+from flask import g, has_request_context
+
+# documents already read in this request, keyed by (collection, _id)
+def getIdentityMap() -> dict[tuple[str, str], dict] | None:
+    if not has_request_context():
+        return None
+    if 'identityMap' not in g:
+        g.identityMap = {}
+    return g.identityMap
+
+def getDocument(collectionName:str, documentId:Any) -> dict | None:
+    identityMap = getIdentityMap()
+    if identityMap is None:
+        return None
+
+    document = identityMap.get((collectionName, str(documentId)))
+    return deepcopy(document) if document is not None else None
+
+def rememberDocument(collectionName:str, documentId:Any, document:dict) -> None:
+    identityMap = getIdentityMap()
+    if identityMap is not None:
+        identityMap[(collectionName, str(documentId))] = deepcopy(document)
+
+def forgetDocument(collectionName:str, documentId:Any) -> None:
+    identityMap = getIdentityMap()
+    if identityMap is not None:
+        identityMap.pop((collectionName, str(documentId)), None)
@@ -0,0 +1,32 @@
+from decimal import Decimal
+from typing import Any
+import orjson
+from bson import Decimal128, ObjectId
+from flask import Response
+from flask.json.provider import JSONProvider
+
+def serializeDefault(value:Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+class OrjsonProvider(JSONProvider):
+    # naive datetimes coming from pymongo are UTC
+    options = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj:Any, **kwargs:Any) -> str:
+        return orjson.dumps(obj, default=serializeDefault, option=self.options).decode()
+
+    def loads(self, s:str | bytes, **kwargs:Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args:Any, **kwargs:Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=serializeDefault, option=self.options),
+            mimetype='application/json'
+        )
@@ -0,0 +1,92 @@
+import base64
+from datetime import datetime
+from typing import Any, List, Tuple
+from bson import ObjectId, json_util
+from flask import abort
+from pymongo import ASCENDING
+from pymongo.collection import Collection
+from config import Config
+
+TypeSort = List[Tuple[str, int]]
+# cursor values become equality operands, a dict or list from the client would be read as a query operator
+cursorValueTypes = (str, int, float, bool, datetime, ObjectId, type(None))
+
+def isUnpaginated(params:dict[str, Any]) -> bool:
+    return params.get('all') == 'true'
+
+def parseLimit(params:dict[str, Any], key:str = 'limit') -> int:
+    try:
+        limit = int(params.get(key, Config.PAGINATION_DEFAULT_LIMIT))
+    except (TypeError, ValueError):
+        abort(422, 'Invalid Limit')
+    if limit < 1:
+        abort(422, 'Invalid Limit')
+
+    return min(limit, Config.PAGINATION_MAX_LIMIT)
+
+def getField(document:dict, path:str) -> Any:
+    value = document
+    for key in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+def encodeCursor(document:dict, sort:TypeSort) -> str:
+    values = [getField(document, field) for field, _ in sort]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+def decodeCursor(cursor:str, sort:TypeSort) -> list:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        abort(422, 'Invalid Cursor')
+    if not isinstance(values, list) or len(values) != len(sort):
+        abort(422, 'Invalid Cursor')
+    if not all(isinstance(value, cursorValueTypes) for value in values):
+        abort(422, 'Invalid Cursor')
+
+    return values
+
+def buildKeysetQuery(sort:TypeSort, values:list) -> dict:
+    # documents strictly after the cursor: equal on every previous sort key, past it on the current one
+    conditions = []
+    for index, (field, direction) in enumerate(sort):
+        condition = {
+            previousField: values[previousIndex]
+            for previousIndex, (previousField, _) in enumerate(sort[:index])
+        }
+        condition[field] = {'$gt' if direction == ASCENDING else '$lt': values[index]}
+        conditions.append(condition)
+
+    return {'$or': conditions}
+
+def applyCursor(query:dict, params:dict[str, Any], sort:TypeSort) -> dict:
+    cursor = params.get('cursor')
+    if not cursor:
+        return query
+
+    keysetQuery = buildKeysetQuery(sort, decodeCursor(cursor, sort))
+    return {'$and': [query, keysetQuery]} if query else keysetQuery
+
+def paginate(collection:Collection, query:dict, sort:TypeSort, params:dict[str, Any], projection:dict = None) -> dict:
+    # sort must end with the '_id' key so the cursor is unique
+    if isUnpaginated(params):
+        return {'data': list(collection.find(query, projection).sort(sort))}
+
+    limit = parseLimit(params)
+    pageData = list(
+        collection.find(applyCursor(query, params, sort), projection)
+        .sort(sort)
+        .limit(limit + 1)
+    )
+
+    nextCursor = None
+    if len(pageData) > limit:
+        pageData.pop()
+        nextCursor = encodeCursor(pageData[-1], sort)
+
+    return {
+        'data': pageData,
+        'nextCursor': nextCursor
+    }
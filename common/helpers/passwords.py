@@ -0,0 +1,76 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Callable
+import bcrypt
+from flask import abort
+from common.metrics import observeDuration
+from config import Config
+
+# bcrypt releases the GIL, so a small thread pool caps how many request threads can be busy hashing
+class PasswordPool:
+    def __init__(self, workers:int, queueSize:int):
+        self.workers = workers
+        self.queueSize = queueSize
+        self.executor: ThreadPoolExecutor | None = None
+        self.slots: threading.BoundedSemaphore | None = None
+        self.pid: int | None = None
+        self.lock = threading.Lock()
+
+    def getExecutor(self) -> ThreadPoolExecutor:
+        # created on first use and again after a fork, worker threads do not survive fork
+        if self.executor is None or self.pid != os.getpid():
+            with self.lock:
+                if self.executor is None or self.pid != os.getpid():
+                    self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+                    # never more than the request threads left after the reserve
+                    self.slots = threading.BoundedSemaphore(max(1, min(
+                        self.workers + self.queueSize,
+                        Config.GUNICORN_THREADS - Config.BCRYPT_RESERVED_THREADS
+                    )))
+                    self.pid = os.getpid()
+        return self.executor
+
+    def run(self, task:Callable, *args):
+        executor = self.getExecutor()
+        slots = self.slots
+        if not slots.acquire(blocking=False):
+            abort(503, 'Server Busy, Please Try Again')
+
+        try:
+            future: Future = executor.submit(task, *args)
+        except RuntimeError:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+
+        try:
+            return future.result(timeout=Config.BCRYPT_TIMEOUT)
+        except TimeoutError:
+            abort(503, 'Server Busy, Please Try Again')
+
+passwordPool = PasswordPool(Config.BCRYPT_WORKERS, Config.BCRYPT_QUEUE_SIZE)
+
+def hashPasswordTask(password:bytes, rounds:int) -> bytes:
+    with observeDuration('bcrypt_duration_seconds', operation='hashpw'):
+        return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+def checkPasswordTask(password:bytes, hashedPassword:bytes) -> bool:
+    with observeDuration('bcrypt_duration_seconds', operation='checkpw'):
+        return bcrypt.checkpw(password, hashedPassword)
+
+def hashPassword(password:str) -> bytes:
+    return passwordPool.run(hashPasswordTask, password.encode(), Config.BCRYPT_ROUNDS)
+
+def checkPassword(password:str, hashedPassword:bytes) -> bool:
+    return passwordPool.run(checkPasswordTask, password.encode(), hashedPassword)
+
+def getPasswordRounds(hashedPassword:bytes) -> int | None:
+    # $2b$<rounds>$<salt and hash>
+    try:
+        return int(hashedPassword.split(b'$')[2])
+    except (IndexError, ValueError):
+        return None
+
+def needsRehash(hashedPassword:bytes) -> bool:
+    return getPasswordRounds(hashedPassword) != Config.BCRYPT_ROUNDS
@@ -0,0 +1,122 @@
+import hashlib
+import threading
+from functools import wraps
+from typing import Callable
+import redis
+from flask import Response, current_app, g, request
+from common.helpers.streaming import getStreamFormat
+from common.redisCircuit import redisCircuit
+from config import Config
+
+# entries carry the tag versions they were built with, a bumped tag makes them stale
+tagKeyPrefix = 'responseCache:tag:'
+entryKeyPrefix = 'responseCache:entry:'
+# tags written while redis was not usable, bumped as soon as the circuit closes again
+pendingTags: set[str] = set()
+pendingTagsLock = threading.Lock()
+
+def getRedisClient() -> redis.Redis | None:
+    redisClient = current_app.config.get('SESSION_REDIS')
+    if not Config.RESPONSE_CACHE_ENABLED or not isinstance(redisClient, redis.Redis) or not redisCircuit.available():
+        return None
+    return redisClient
+
+def formatTagVersions(values:list) -> bytes:
+    return ','.join((value or b'0').decode() for value in values).encode()
+
+def getTagVersions(*tags:str) -> bytes | None:
+    # None while redis is not usable, nothing cached per process can be trusted then
+    redisClient = getRedisClient()
+    if not redisClient:
+        return None
+    try:
+        return formatTagVersions(redisClient.mget([f'{tagKeyPrefix}{tag}' for tag in tags]))
+    except redis.RedisError as e:
+        redisCircuit.recordFailure(e)
+        return None
+
+def buildEntryKey() -> str:
+    args = '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+    argsHash = hashlib.sha1(args.encode()).hexdigest()
+    return f'{entryKeyPrefix}{request.endpoint}:{g.user["userRole"]}:{argsHash}'
+
+def cacheResponse(*tags:str):
+    def decorator(f: Callable):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            redisClient = getRedisClient()
+            if not redisClient or getStreamFormat(request.args):
+                return f(*args, **kwargs)
+
+            entryKey = buildEntryKey()
+            try:
+                # tag versions and the entry in one round trip
+                values = redisClient.mget([f'{tagKeyPrefix}{tag}' for tag in tags] + [entryKey])
+            except redis.RedisError as e:
+                redisCircuit.recordFailure(e)
+                return f(*args, **kwargs)
+
+            versions = formatTagVersions(values[:-1])
+            cachedEntry = values[-1]
+            if cachedEntry:
+                cachedVersions, _, body = cachedEntry.partition(b'|')
+                if cachedVersions == versions:
+                    response = current_app.response_class(body, mimetype='application/json')
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+            response: Response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                try:
+                    redisClient.set(entryKey, versions + b'|' + response.get_data(), ex=Config.RESPONSE_CACHE_TTL)
+                except redis.RedisError as e:
+                    redisCircuit.recordFailure(e)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return decorated_function
+    return decorator
+
+def invalidateResponseCache(*tags:str) -> None:
+    if not Config.RESPONSE_CACHE_ENABLED or not isinstance(current_app.config.get('SESSION_REDIS'), redis.Redis):
+        return
+    if not redisCircuit.available():
+        rememberPendingTags(tags)
+        return
+
+    try:
+        bumpTags(redisCircuit.client, tags)
+    except redis.RedisError as e:
+        print(f'Warning: Failed invalidate response cache {tags} - {str(e)}')
+        rememberPendingTags(tags)
+        redisCircuit.recordFailure(e)
+        return
+    if pendingTags:
+        flushPendingTags()
+
+# helper function
+def bumpTags(redisClient:redis.Redis, tags) -> None:
+    pipeline = redisClient.pipeline(transaction=False)
+    for tag in tags:
+        pipeline.incr(f'{tagKeyPrefix}{tag}')
+    pipeline.execute()
+
+def rememberPendingTags(tags) -> None:
+    with pendingTagsLock:
+        pendingTags.update(tags)
+
+def flushPendingTags() -> None:
+    # entries cached before the outage must not outlive the writes made during it
+    with pendingTagsLock:
+        tags = list(pendingTags)
+        pendingTags.clear()
+    if not tags:
+        return
+
+    try:
+        bumpTags(redisCircuit.client, tags)
+    except redis.RedisError as e:
+        print(f'Warning: Failed invalidate response cache {tags} - {str(e)}')
+        rememberPendingTags(tags)
+        redisCircuit.recordFailure(e)
+
+redisCircuit.addCloseListener(flushPendingTags)
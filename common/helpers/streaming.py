@@ -0,0 +1,67 @@
+from typing import Any, Iterator
+from flask import Response, current_app, request, stream_with_context
+from pymongo.collection import Collection
+from pymongo.cursor import Cursor
+from common.helpers.pagination import TypeSort
+from config import Config
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+JSON_MIMETYPE = 'application/json'
+
+def getStreamFormat(params:dict[str, Any]) -> str | None:
+    if request.accept_mimetypes.best_match([JSON_MIMETYPE, NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+        return NDJSON_MIMETYPE
+    if params.get('stream') == 'true':
+        return JSON_MIMETYPE
+    return None
+
+def streamCursor(collection:Collection, query:dict, sort:TypeSort) -> Iterator[dict]:
+    cursor = collection.find(query).sort(sort).batch_size(Config.STREAM_BATCH_SIZE)
+    # the first batch is fetched before the response starts, an error here still answers with a 5xx
+    try:
+        firstDocument = next(cursor, None)
+    except Exception:
+        cursor.close()
+        raise
+    return iterateCursor(cursor, firstDocument)
+
+def iterateCursor(cursor:Cursor, firstDocument:dict | None) -> Iterator[dict]:
+    try:
+        if firstDocument is not None:
+            yield firstDocument
+            yield from cursor
+    finally:
+        cursor.close()
+
+def serializeDocument(document:dict) -> str:
+    return current_app.json.dumps(document)
+
+# the status is already sent once a stream fails part way, the error is written as the last record instead
+def generateNdjson(documents:Iterator[dict]) -> Iterator[str]:
+    try:
+        for document in documents:
+            yield serializeDocument(document) + '\n'
+    except Exception as e:
+        print(f'Warning: Failed stream response - {str(e)}')
+        yield serializeDocument({'error': str(e)}) + '\n'
+    finally:
+        documents.close()
+
+def generateJsonArray(documents:Iterator[dict]) -> Iterator[str]:
+    # same shape as the non streamed response: {"data": [...]}, with an "error" key after data when it fails
+    try:
+        yield '{"data": ['
+        separator = ''
+        for document in documents:
+            yield separator + serializeDocument(document)
+            separator = ','
+        yield ']}'
+    except Exception as e:
+        print(f'Warning: Failed stream response - {str(e)}')
+        yield '], "error": ' + serializeDocument(str(e)) + '}'
+    finally:
+        documents.close()
+
+def streamResponse(documents:Iterator[dict], streamFormat:str) -> Response:
+    generator = generateNdjson if streamFormat == NDJSON_MIMETYPE else generateJsonArray
+    return Response(stream_with_context(generator(documents)), mimetype=streamFormat)
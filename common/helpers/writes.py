@@ -0,0 +1,32 @@
+from typing import Any
+from bson import ObjectId
+from flask import abort
+from pymongo import ReturnDocument
+from pymongo.collection import Collection
+
+# only ask for the _id back when the caller does not return the document
+idProjection = {'_id': 1}
+
+def activeDocumentQuery(documentId:Any) -> dict:
+    return {
+        '_id': ObjectId(documentId),
+        'activeStatus': True
+    }
+
+def updateOneOr404(collection:Collection, query:dict, update:dict, notFoundMessage:str, projection:dict = None) -> dict:
+    # existence is part of the filter, so the check and the write are one atomic round trip
+    documentUpdated = collection.find_one_and_update(
+        query,
+        update,
+        projection,
+        return_document=ReturnDocument.AFTER
+    )
+    if not documentUpdated:
+        abort(404, notFoundMessage)
+
+    return documentUpdated
+
+def deleteOneOr404(collection:Collection, query:dict, notFoundMessage:str) -> None:
+    response = collection.delete_one(query)
+    if not response.deleted_count:
+        abort(404, notFoundMessage)
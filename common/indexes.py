@@ -0,0 +1,178 @@
+import argparse
+from typing import Any, List
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import PyMongoError
+from common.db import dbInstance
+from common.helpers.explain import getPlanStages, getWinningPlan
+
+# usage: python -m common.indexes ensure | report
+
+# every index the controllers rely on, with the query shape it serves
+indexRegistry = {
+    'USER': [
+        {
+            'name': 'username',
+            'keys': [('username', ASCENDING)],
+            'unique': True,
+            'query': {'filter': {'username': ''}},
+            'usedBy': 'auth.userLogin, user.insertUser'
+        }
+    ],
+    'VMS VENDOR': [
+        {
+            'name': 'vendorName_activeStatus',
+            'keys': [('vendorName', ASCENDING), ('activeStatus', ASCENDING)],
+            'query': {'filter': {'vendorName': '', 'activeStatus': True}},
+            'usedBy': 'vendor.validateUniqueField'
+        },
+        {
+            'name': 'activeStatus_id',
+            'keys': [('activeStatus', ASCENDING), ('_id', ASCENDING)],
+            'query': {'filter': {'activeStatus': True}, 'sort': [('_id', ASCENDING)]},
+            'usedBy': 'vendor.findAllVendor'
+        }
+    ],
+    'PRODUCT': [
+        {
+            'name': 'name',
+            'keys': [('name', ASCENDING)],
+            'query': {'filter': {'name': ''}},
+            'usedBy': 'product.validateUniqueField'
+        },
+        {
+            'name': 'activeStatus_id',
+            'keys': [('activeStatus', ASCENDING), ('_id', ASCENDING)],
+            'query': {'filter': {'activeStatus': True}, 'sort': [('_id', ASCENDING)]},
+            'usedBy': 'product.findAllProduct'
+        }
+    ],
+    'REQUEST': [
+        {
+            'name': 'branchId_status_createDate_id',
+            'keys': [
+                ('branch.branchId', ASCENDING),
+                ('status', DESCENDING),
+                ('setup.createDate', DESCENDING),
+                ('_id', DESCENDING)
+            ],
+            'query': {
+                'filter': {'branch.branchId': ''},
+                'sort': [('status', DESCENDING), ('setup.createDate', DESCENDING), ('_id', DESCENDING)]
+            },
+            'usedBy': 'request.findAllRequest (branch)'
+        },
+        {
+            'name': 'status_createDate_id',
+            'keys': [('status', DESCENDING), ('setup.createDate', DESCENDING), ('_id', DESCENDING)],
+            'query': {
+                'filter': {},
+                'sort': [('status', DESCENDING), ('setup.createDate', DESCENDING), ('_id', DESCENDING)]
+            },
+            'usedBy': 'request.findAllRequest (inventory)'
+        }
+    ],
+    'BRANCH PRODUCT': [
+        {
+            'name': 'branchId_productId',
+            'keys': [('branchId', ASCENDING), ('productId', ASCENDING)],
+            'unique': True,
+            'query': {'filter': {'branchId': None, 'productId': ''}},
+            'usedBy': 'branch.findBranchProductByIdAndUser, request.acceptRequest'
+        },
+        {
+            'name': 'branchId_name',
+            'keys': [('branchId', ASCENDING), ('name', ASCENDING)],
+            'query': {'filter': {'branchId': None}, 'sort': [('name', ASCENDING)]},
+            'usedBy': 'branch.findAllBranchProductByUser'
+        },
+        {
+            'name': 'branchId_nameLower',
+            'keys': [('branchId', ASCENDING), ('nameLower', ASCENDING)],
+            'query': {'filter': {'branchId': None, 'nameLower': {'$regex': '^a'}}},
+            'usedBy': 'branch.findAllBranchProductByUser (name)'
+        }
+    ],
+    'VMS BANK': [
+        {
+            'name': 'activeStatus_id',
+            'keys': [('activeStatus', ASCENDING), ('_id', ASCENDING)],
+            'query': {'filter': {'activeStatus': True}, 'sort': [('_id', ASCENDING)]},
+            'usedBy': 'masterBank.findAllMasterBank'
+        }
+    ]
+}
+
+def ensureIndexes() -> dict[str, List[str]]:
+    createdIndexes = {}
+    for collectionName, indexes in indexRegistry.items():
+        try:
+            createdIndexes[collectionName] = dbInstance.db[collectionName].create_indexes([
+                IndexModel(index['keys'], name=index['name'], unique=index.get('unique', False))
+                for index in indexes
+            ])
+        except PyMongoError as e:
+            print(f'Error: Failed create indexes for {collectionName} - {e}')
+
+    return createdIndexes
+
+def explainQuery(collectionName:str, query:dict) -> dict[str, Any]:
+    cursor = dbInstance.db[collectionName].find(query['filter'])
+    if query.get('sort'):
+        cursor = cursor.sort(query['sort'])
+    queryPlanner = cursor.limit(1).explain()['queryPlanner']
+    stages = getPlanStages(getWinningPlan(queryPlanner))
+
+    return {
+        'stages': stages,
+        'collscan': 'COLLSCAN' in stages
+    }
+
+def reportIndexes() -> dict[str, dict[str, Any]]:
+    report = {}
+    for collectionName, indexes in indexRegistry.items():
+        collection = dbInstance.db[collectionName]
+        existingIndexes = collection.index_information()
+        indexStats = {
+            stats['name']: stats['accesses']['ops']
+            for stats in collection.aggregate([{'$indexStats': {}}])
+        }
+
+        report[collectionName] = {
+            'missing': [index['name'] for index in indexes if index['name'] not in existingIndexes],
+            'unused': [
+                name for name in existingIndexes
+                if name != '_id_' and indexStats.get(name, 0) == 0
+            ],
+            'queries': [
+                {
+                    'index': index['name'],
+                    'usedBy': index['usedBy'],
+                    **explainQuery(collectionName, index['query'])
+                } for index in indexes
+            ]
+        }
+
+    return report
+
+def printReport(report:dict[str, dict[str, Any]]) -> None:
+    for collectionName, collectionReport in report.items():
+        print(f'[{collectionName}]')
+        print(f'  missing: {", ".join(collectionReport["missing"]) or "-"}')
+        print(f'  unused : {", ".join(collectionReport["unused"]) or "-"}')
+        for query in collectionReport['queries']:
+            status = 'COLLSCAN' if query['collscan'] else 'ok'
+            print(f'  {status:<8} {query["usedBy"]} -> {" <- ".join(query["stages"])}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Create and verify the indexes used by the controllers')
+    parser.add_argument('command', choices=['ensure', 'report'])
+    args = parser.parse_args()
+
+    if args.command == 'ensure':
+        for collectionName, indexNames in ensureIndexes().items():
+            print(f'{collectionName}: {", ".join(indexNames)}')
+    else:
+        printReport(reportIndexes())
+
+if __name__ == '__main__':
+    main()
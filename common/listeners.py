@@ -0,0 +1,60 @@
+import threading
+from flask import g, has_request_context
+from pymongo import monitoring
+from common.metrics import buildLabels, getEndpoint, incrementCounter, observeHistogram
+from common.profiler import profilerEnabled, recordProfileCommand
+from common.slowQueries import slowQueryLog
+
+# commands started on this thread and not finished yet, keyed by request id
+pendingCommands = threading.local()
+
+# counts the mongo commands issued while handling the current request and records them as metrics
+class CommandCounter(monitoring.CommandListener):
+    def started(self, event:monitoring.CommandStartedEvent) -> None:
+        if has_request_context():
+            g.mongoCommands = g.get('mongoCommands', 0) + 1
+
+        collectionName = event.command.get(event.command_name)
+        if not isinstance(collectionName, str):
+            collectionName = 'none'
+        getPendingCommands()[event.request_id] = (
+            buildLabels(endpoint=getEndpoint(), collection=collectionName, command=event.command_name),
+            event.command if slowQueryLog.enabled() else None,
+            recordProfileCommand(event.command_name, collectionName, event.command) if profilerEnabled and has_request_context() else None
+        )
+
+    def succeeded(self, event:monitoring.CommandSucceededEvent) -> None:
+        self.record(event)
+
+    def failed(self, event:monitoring.CommandFailedEvent) -> None:
+        self.record(event)
+
+    def record(self, event:monitoring.CommandSucceededEvent | monitoring.CommandFailedEvent) -> None:
+        pendingCommand = getPendingCommands().pop(event.request_id, None)
+        if pendingCommand is None:
+            return
+        labels, command, profileCommand = pendingCommand
+        if profileCommand is not None:
+            profileCommand['durationMs'] = round(event.duration_micros / 1e3, 3)
+        incrementCounter('mongo_commands_total', labels)
+        observeHistogram('mongo_command_duration_seconds', labels, event.duration_micros / 1e6)
+
+        if command is not None:
+            slowQueryLog.observe(
+                dict(labels)['endpoint'],
+                event.database_name,
+                command,
+                event.command_name,
+                event.duration_micros / 1e3,
+                getattr(event, 'reply', None)
+            )
+
+def getPendingCommands() -> dict:
+    if not hasattr(pendingCommands, 'commands'):
+        pendingCommands.commands = {}
+    return pendingCommands.commands
+
+def getCommandCount() -> int:
+    return g.get('mongoCommands', 0) if has_request_context() else 0
+
+commandCounter = CommandCounter()
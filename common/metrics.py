@@ -0,0 +1,192 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Iterator
+from flask import Flask, Response, g, has_request_context, request
+from common.helpers.cache import cacheStats
+
+# every thread records into its own shard, the lock is only taken when a thread records for the first time and on scrape
+latencyBuckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+sizeBuckets = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+metricDefinitions = {
+    'http_requests_total': {
+        'type': 'counter',
+        'help': 'HTTP requests by endpoint, method and status'
+    },
+    'http_request_duration_seconds': {
+        'type': 'histogram',
+        'help': 'HTTP request latency by endpoint',
+        'buckets': latencyBuckets
+    },
+    'http_response_size_bytes': {
+        'type': 'histogram',
+        'help': 'HTTP response payload size by endpoint',
+        'buckets': sizeBuckets
+    },
+    'mongo_commands_total': {
+        'type': 'counter',
+        'help': 'Mongo commands by endpoint, collection and command'
+    },
+    'mongo_command_duration_seconds': {
+        'type': 'histogram',
+        'help': 'Mongo command duration by endpoint, collection and command',
+        'buckets': latencyBuckets
+    },
+    'redis_session_fetch_seconds': {
+        'type': 'histogram',
+        'help': 'Time spent loading the session from redis',
+        'buckets': latencyBuckets
+    },
+    'session_cache_requests_total': {
+        'type': 'counter',
+        'help': 'Session loads by local cache result'
+    },
+    'session_cache_saved_seconds_total': {
+        'type': 'counter',
+        'help': 'Estimated redis round trip time saved by the local session cache'
+    },
+    'redis_circuit_transitions_total': {
+        'type': 'counter',
+        'help': 'Redis circuit breaker state changes'
+    },
+    'bcrypt_duration_seconds': {
+        'type': 'histogram',
+        'help': 'Time spent hashing or checking passwords',
+        'buckets': latencyBuckets
+    }
+}
+
+TypeLabels = tuple[tuple[str, str], ...]
+
+class MetricShard:
+    def __init__(self):
+        self.counters: dict[tuple[str, TypeLabels], float] = {}
+        self.histograms: dict[tuple[str, TypeLabels], list] = {}
+
+shards: list[MetricShard] = []
+shardsLock = threading.Lock()
+localShard = threading.local()
+
+def getShard() -> MetricShard:
+    shard = getattr(localShard, 'shard', None)
+    if shard is None:
+        shard = MetricShard()
+        with shardsLock:
+            shards.append(shard)
+        localShard.shard = shard
+    return shard
+
+def buildLabels(**labels:str) -> TypeLabels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def incrementCounter(name:str, labels:TypeLabels, value:float = 1) -> None:
+    counters = getShard().counters
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+def observeHistogram(name:str, labels:TypeLabels, value:float) -> None:
+    histograms = getShard().histograms
+    key = (name, labels)
+    buckets = metricDefinitions[name]['buckets']
+    histogram = histograms.get(key)
+    if histogram is None:
+        # one slot per bucket, one for +Inf, then the sum
+        histogram = histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+    histogram[bisect_left(buckets, value)] += 1
+    histogram[-1] += value
+
+@contextmanager
+def observeDuration(name:str, **labels:str) -> Iterator[None]:
+    startTime = time.perf_counter()
+    try:
+        yield
+    finally:
+        observeHistogram(name, buildLabels(**labels), time.perf_counter() - startTime)
+
+def getEndpoint() -> str:
+    if has_request_context():
+        return request.endpoint or 'unknown'
+    return 'none'
+
+def collectShards() -> tuple[dict, dict]:
+    counters = {}
+    histograms = {}
+    with shardsLock:
+        currentShards = list(shards)
+
+    for shard in currentShards:
+        # copy() keeps the owner thread free to keep writing while we merge
+        for key, value in shard.counters.copy().items():
+            counters[key] = counters.get(key, 0) + value
+        for key, histogram in shard.histograms.copy().items():
+            histogram = list(histogram)
+            mergedHistogram = histograms.setdefault(key, [0] * len(histogram))
+            for index, value in enumerate(histogram):
+                mergedHistogram[index] += value
+
+    return counters, histograms
+
+def formatLabels(labels:TypeLabels, **extraLabels:str) -> str:
+    allLabels = list(labels) + list(extraLabels.items())
+    if not allLabels:
+        return ''
+    return '{' + ','.join(f'{key}="{escapeLabel(value)}"' for key, value in allLabels) + '}'
+
+def escapeLabel(value:str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def renderMetrics() -> str:
+    counters, histograms = collectShards()
+    lines = []
+
+    for name, definition in metricDefinitions.items():
+        lines.append(f'# HELP {name} {definition["help"]}')
+        lines.append(f'# TYPE {name} {definition["type"]}')
+        if definition['type'] == 'counter':
+            for (metricName, labels), value in sorted(counters.items()):
+                if metricName == name:
+                    lines.append(f'{name}{formatLabels(labels)} {value}')
+            continue
+
+        for (metricName, labels), histogram in sorted(histograms.items()):
+            if metricName != name:
+                continue
+            cumulativeCount = 0
+            for bucket, count in zip(definition['buckets'] + ('+Inf',), histogram[:-1]):
+                cumulativeCount += count
+                lines.append(f'{name}_bucket{formatLabels(labels, le=str(bucket))} {cumulativeCount}')
+            lines.append(f'{name}_sum{formatLabels(labels)} {histogram[-1]}')
+            lines.append(f'{name}_count{formatLabels(labels)} {cumulativeCount}')
+
+    # in process caches keep their own counters
+    for stat, metricType in [('hits', 'counter'), ('misses', 'counter'), ('size', 'gauge')]:
+        name = f'reference_cache_{stat}' + ('_total' if metricType == 'counter' else '')
+        lines.append(f'# HELP {name} Reference cache {stat}')
+        lines.append(f'# TYPE {name} {metricType}')
+        for cacheName, stats in cacheStats().items():
+            lines.append(f'{name}{formatLabels(buildLabels(cache=cacheName))} {stats[stat]}')
+
+    return '\n'.join(lines) + '\n'
+
+def metricsResponse() -> Response:
+    return Response(renderMetrics(), mimetype='text/plain; version=0.0.4')
+
+def initMetrics(app:Flask) -> None:
+    @app.before_request
+    def startRequestTimer():
+        g.requestStartTime = time.perf_counter()
+
+    @app.after_request
+    def recordRequestMetrics(response:Response) -> Response:
+        startTime = g.get('requestStartTime')
+        if startTime is None:
+            return response
+
+        endpoint = getEndpoint()
+        observeHistogram('http_request_duration_seconds', buildLabels(endpoint=endpoint), time.perf_counter() - startTime)
+        incrementCounter('http_requests_total', buildLabels(endpoint=endpoint, method=request.method, status=response.status_code))
+        if not response.is_streamed:
+            observeHistogram('http_response_size_bytes', buildLabels(endpoint=endpoint), response.calculate_content_length() or 0)
+        return response
@@ -0,0 +1,84 @@
+from pymongo import IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError
+from common.db import dbInstance
+from common.indexes import indexRegistry
+
+# usage: python -m common.migrateBranchProduct
+# one-off: moves the embedded VMS BRANCH.product array into BRANCH PRODUCT, run it before a release that reads BRANCH PRODUCT takes traffic
+# every branch is claimed by removing its array in one write, so concurrent runs never migrate the same branch twice
+# it also fills nameLower on rows written before the branch product name search used it
+
+backfillBatchSize = 1000
+
+def migrateBranchProduct() -> dict[str, int]:
+    branchCollection = dbInstance.db['VMS BRANCH']
+    branchProductCollection = dbInstance.db['BRANCH PRODUCT']
+    migratedBranches = 0
+    migratedProducts = 0
+
+    # concurrent upserts of one (branchId, productId) only merge while the unique index exists
+    uniqueIndex = next(index for index in indexRegistry['BRANCH PRODUCT'] if index['name'] == 'branchId_productId')
+    branchProductCollection.create_indexes([IndexModel(uniqueIndex['keys'], name=uniqueIndex['name'], unique=True)])
+
+    while True:
+        branch = branchCollection.find_one_and_update(
+            {'product': {'$exists': True}},
+            {'$unset': {'product': ''}},
+            {'product': 1}
+        )
+        if not branch:
+            break
+
+        branchProducts = branch.get('product') or []
+        if branchProducts:
+            try:
+                # a row upserted by accept or update before the migration keeps its count and gains the embedded one
+                branchProductCollection.bulk_write([
+                    UpdateOne(
+                        {'branchId': branch['_id'], 'productId': branchProduct['productId']},
+                        {
+                            '$inc': {'count': branchProduct.get('count', 0)},
+                            '$setOnInsert': {
+                                **{key: value for key, value in branchProduct.items() if key not in ('productId', 'count')},
+                                'nameLower': str(branchProduct.get('name', '')).lower()
+                            }
+                        },
+                        upsert=True
+                    ) for branchProduct in branchProducts
+                ], ordered=True)
+            except BulkWriteError as e:
+                # give the branch back the products that were not written, a rerun picks them up
+                appliedCount = e.details['writeErrors'][0]['index']
+                branchCollection.update_one({'_id': branch['_id']}, {'$push': {'product': {'$each': branchProducts[appliedCount:]}}})
+                raise
+
+        migratedBranches += 1
+        migratedProducts += len(branchProducts)
+
+    return {
+        'branches': migratedBranches,
+        'products': migratedProducts,
+        'nameLower': backfillNameLower(branchProductCollection)
+    }
+
+# helper function
+def backfillNameLower(branchProductCollection) -> int:
+    # lowercased in python like every write, $toLower only folds ascii
+    backfilledProducts = 0
+    updateBranchProductQueries = []
+    for branchProduct in branchProductCollection.find({'nameLower': {'$exists': False}}, {'name': 1}):
+        updateBranchProductQueries.append(UpdateOne(
+            {'_id': branchProduct['_id']},
+            {'$set': {'nameLower': str(branchProduct.get('name', '')).lower()}}
+        ))
+        if len(updateBranchProductQueries) >= backfillBatchSize:
+            backfilledProducts += branchProductCollection.bulk_write(updateBranchProductQueries, ordered=False).modified_count
+            updateBranchProductQueries = []
+    if updateBranchProductQueries:
+        backfilledProducts += branchProductCollection.bulk_write(updateBranchProductQueries, ordered=False).modified_count
+
+    return backfilledProducts
+
+if __name__ == '__main__':
+    result = migrateBranchProduct()
+    print(f'Migrated {result["products"]} products from {result["branches"]} branches, filled nameLower on {result["nameLower"]} products')
@@ -0,0 +1,154 @@
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from datetime import UTC, datetime
+from functools import wraps
+from typing import Any, Callable, List
+from flask import Flask, g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from common.slowQueries import getQueryShape
+from config import Config
+
+# usage: python -m common.profiler token <userId>
+#        curl -H 'X-Profile-Token: <token>' ... with the session of that inventory user
+
+profilerEnabled = Config.PROFILE_SAMPLE_RATE > 0 or Config.PROFILE_HEADER_ENABLED
+profileHeader = 'X-Profile-Token'
+# cProfile allows one active profiler per process, concurrent requests are not profiled
+profileLock = threading.Lock()
+skippedEndpoints = {'static', 'metrics', 'healthz', 'readyz'}
+
+def getTokenSerializer() -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(Config.SECRET_KEY, salt='profile')
+
+def createProfileToken(userId:str) -> str:
+    return getTokenSerializer().dumps({'userId': userId})
+
+def hasValidProfileToken() -> bool:
+    token = request.headers.get(profileHeader)
+    user = g.get('user')
+    if not token or not user or user.get('userRole') != 'inventory':
+        return False
+    try:
+        payload = getTokenSerializer().loads(token, max_age=Config.PROFILE_TOKEN_MAX_AGE)
+    except BadSignature:
+        return False
+    return isinstance(payload, dict) and payload.get('userId') == user['_id']
+
+def shouldProfile() -> bool:
+    if Config.PROFILE_SAMPLE_RATE > 0 and random.random() < Config.PROFILE_SAMPLE_RATE:
+        return True
+    return Config.PROFILE_HEADER_ENABLED and hasValidProfileToken()
+
+def profileView(view:Callable) -> Callable:
+    @wraps(view)
+    def profiledView(*args, **kwargs):
+        if not shouldProfile() or not profileLock.acquire(blocking=False):
+            return view(*args, **kwargs)
+
+        try:
+            g.profileCommands = []
+            profile = cProfile.Profile()
+            startTime = time.perf_counter()
+            profile.enable()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                profile.disable()
+                saveProfile(profile, (time.perf_counter() - startTime) * 1000, g.profileCommands)
+                g.profileCommands = None
+        finally:
+            profileLock.release()
+    return profiledView
+
+def initProfiler(app:Flask) -> None:
+    # views are only wrapped when profiling is configured, otherwise requests never see it
+    if not profilerEnabled:
+        return
+    for endpoint, view in list(app.view_functions.items()):
+        if endpoint not in skippedEndpoints and not endpoint.startswith('swagger'):
+            app.view_functions[endpoint] = profileView(view)
+
+def getTopFunctions(profile:cProfile.Profile, limit:int = 20) -> List[dict]:
+    stats = pstats.Stats(profile).stats
+    functions = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{
+        'function': f'{fileName}:{lineNumber}({functionName})',
+        'calls': callCount,
+        'totalMs': round(totalTime * 1000, 3),
+        'cumulativeMs': round(cumulativeTime * 1000, 3)
+    } for (fileName, lineNumber, functionName), (_, callCount, totalTime, cumulativeTime, _) in functions]
+
+def saveProfile(profile:cProfile.Profile, durationMs:float, mongoCommands:List[dict]) -> None:
+    try:
+        os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+        profiles = listProfiles()
+        # only the slowest are kept, a faster request than all of them is not worth writing
+        if len(profiles) >= Config.PROFILE_KEEP and durationMs <= profiles[-1][0]:
+            return
+
+        baseName = f'{durationMs:012.3f}ms-{request.endpoint}-{datetime.now(UTC):%Y%m%d%H%M%S%f}-{os.getpid()}'
+        basePath = os.path.join(Config.PROFILE_DIR, baseName)
+        profile.dump_stats(f'{basePath}.prof')
+        with open(f'{basePath}.json', 'w') as summaryFile:
+            json.dump({
+                'endpoint': request.endpoint,
+                'method': request.method,
+                'path': request.full_path,
+                'durationMs': round(durationMs, 3),
+                'timestamp': datetime.now(UTC).isoformat(),
+                'mongoCommands': mongoCommands,
+                'topFunctions': getTopFunctions(profile)
+            }, summaryFile, indent=2, default=str)
+
+        for _, oldBasePath in listProfiles()[Config.PROFILE_KEEP:]:
+            for extension in ('.prof', '.json'):
+                if os.path.exists(oldBasePath + extension):
+                    os.remove(oldBasePath + extension)
+    except OSError as e:
+        print(f'Warning: Failed save profile - {str(e)}')
+
+def listProfiles() -> List[tuple[float, str]]:
+    # file names start with the duration, slowest first
+    profiles = []
+    for fileName in os.listdir(Config.PROFILE_DIR):
+        if not fileName.endswith('.prof'):
+            continue
+        try:
+            durationMs = float(fileName.split('ms-', 1)[0])
+        except ValueError:
+            continue
+        profiles.append((durationMs, os.path.join(Config.PROFILE_DIR, fileName[:-len('.prof')])))
+    return sorted(profiles, reverse=True)
+
+def recordProfileCommand(commandName:str, collectionName:str, command:dict) -> dict[str, Any] | None:
+    # called by the command listener, None unless the current request is being profiled
+    if g.get('profileCommands') is None:
+        return None
+
+    profileCommand = {
+        'command': commandName,
+        'collection': collectionName,
+        'shape': getQueryShape(commandName, command),
+        'durationMs': None
+    }
+    g.profileCommands.append(profileCommand)
+    return profileCommand
+
+def main():
+    parser = argparse.ArgumentParser(description='Create a signed token that profiles the requests of one inventory user')
+    parser.add_argument('command', choices=['token'])
+    parser.add_argument('userId')
+    args = parser.parse_args()
+
+    if not Config.SECRET_KEY:
+        parser.error('SECRET_KEY is required to sign the token')
+    print(createProfileToken(args.userId))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import threading
+import time
+from typing import Callable
+import redis
+from common.metrics import buildLabels, incrementCounter
+from config import Config
+
+# closed: redis is used, open: redis is skipped until the reconnect worker gets a ping through
+class RedisCircuit:
+    def __init__(self, baseDelay:float, maxDelay:float):
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.client: redis.Redis | None = None
+        self.state = 'open'
+        self.lock = threading.Lock()
+        self.worker: threading.Thread | None = None
+        # called every time the circuit closes after being open or half-open
+        self.closeListeners: list[Callable[[], None]] = []
+
+    def addCloseListener(self, listener:Callable[[], None]) -> None:
+        self.closeListeners.append(listener)
+
+    def connect(self, client:redis.Redis, probe:bool = True) -> None:
+        self.client = client
+        if not probe:
+            # assume redis is up, the first failed command opens the circuit
+            self.setState('closed')
+            return
+        try:
+            client.ping()
+            self.setState('closed')
+        except redis.RedisError as e:
+            self.recordFailure(e)
+
+    def afterFork(self) -> None:
+        # the reconnect worker does not survive fork, probe again in the child
+        self.lock = threading.Lock()
+        self.worker = None
+        if self.client is not None:
+            self.connect(self.client, not Config.LAZY_STARTUP)
+
+    def available(self) -> bool:
+        return self.state == 'closed'
+
+    def recordFailure(self, e:Exception) -> None:
+        with self.lock:
+            if self.state == 'open' and self.worker and self.worker.is_alive():
+                return
+            print(f'Warning: Redis unavailable, using fallback session store - {str(e)}')
+            self.setState('open')
+            self.worker = threading.Thread(target=self.reconnect, name='redisReconnect', daemon=True)
+            self.worker.start()
+
+    def setState(self, state:str) -> None:
+        previousState = self.state
+        self.state = state
+        incrementCounter('redis_circuit_transitions_total', buildLabels(state=state))
+        if state == 'closed' and previousState != 'closed':
+            for listener in self.closeListeners:
+                try:
+                    listener()
+                except Exception as e:
+                    print(f'Warning: Failed run redis close listener - {str(e)}')
+
+    def reconnect(self) -> None:
+        delay = self.baseDelay
+        while True:
+            time.sleep(delay)
+            self.setState('half-open')
+            try:
+                self.client.ping()
+            except redis.RedisError:
+                self.setState('open')
+                delay = min(delay * 2, self.maxDelay)
+                continue
+
+            self.setState('closed')
+            print('Warning: Redis connection restored')
+            return
+
+redisCircuit = RedisCircuit(Config.REDIS_RECONNECT_BASE_DELAY, Config.REDIS_RECONNECT_MAX_DELAY)
@@ -0,0 +1,100 @@
+import time
+from datetime import timedelta
+from typing import Optional
+import redis
+from flask import Flask
+from flask_session.base import ServerSideSession
+from flask_session.defaults import Defaults
+from flask_session.redis import RedisSessionInterface
+from common.helpers.cache import TTLCache
+from common.metrics import buildLabels, incrementCounter, observeHistogram
+from common.redisCircuit import redisCircuit
+from config import Config
+
+# sessions read or written in the last few seconds are served from process memory instead of redis
+# while the redis circuit is open sessions live in a bounded in process store and move back once it closes
+class TieredSessionInterface(RedisSessionInterface):
+    def __init__(self, app:Flask, client, **kwargs):
+        super().__init__(app, client, **kwargs)
+        self.localSessions = TTLCache('session', Config.SESSION_CACHE_SIZE, Config.SESSION_CACHE_TTL)
+        # an empty dict marks a session deleted while redis was down
+        self.fallbackSessions = TTLCache('sessionFallback', Config.SESSION_FALLBACK_SIZE, Config.PERMANENT_SESSION_LIFETIME)
+        # moving average of a redis fetch, what every local hit saves
+        self.averageFetchSeconds = 0.0
+
+    def _retrieve_session_data(self, store_id:str) -> Optional[dict]:
+        sessionData = self.localSessions.get(store_id)
+        if sessionData is not None:
+            incrementCounter('session_cache_requests_total', buildLabels(result='hit'))
+            incrementCounter('session_cache_saved_seconds_total', (), self.averageFetchSeconds)
+            return sessionData
+
+        if not redisCircuit.available():
+            return self.fallbackSessions.get(store_id) or None
+
+        fallbackData = self.fallbackSessions.get(store_id)
+        if fallbackData is not None:
+            # written or deleted during the outage, the copy in redis is stale
+            sessionData = self.restoreFallbackSession(store_id, fallbackData)
+        else:
+            startTime = time.perf_counter()
+            try:
+                sessionData = super()._retrieve_session_data(store_id)
+            except redis.RedisError as e:
+                redisCircuit.recordFailure(e)
+                return None
+            fetchSeconds = time.perf_counter() - startTime
+            observeHistogram('redis_session_fetch_seconds', (), fetchSeconds)
+            incrementCounter('session_cache_requests_total', buildLabels(result='miss'))
+            self.averageFetchSeconds = fetchSeconds if not self.averageFetchSeconds else self.averageFetchSeconds * 0.9 + fetchSeconds * 0.1
+
+        if sessionData is not None:
+            self.localSessions.set(store_id, sessionData)
+        return sessionData
+
+    def _upsert_session(self, session_lifetime:timedelta, session:ServerSideSession, store_id:str) -> None:
+        # an unchanged session still in the local cache was read or written moments ago, its redis expiry barely moved
+        if not session.modified and self.localSessions.get(store_id) is not None:
+            return
+
+        self.localSessions.set(store_id, dict(session))
+        if redisCircuit.available():
+            try:
+                super()._upsert_session(session_lifetime, session, store_id)
+                return
+            except redis.RedisError as e:
+                redisCircuit.recordFailure(e)
+        self.fallbackSessions.set(store_id, dict(session))
+
+    def _delete_session(self, store_id:str) -> None:
+        self.localSessions.invalidate(store_id)
+        self.fallbackSessions.invalidate(store_id)
+        if redisCircuit.available():
+            try:
+                super()._delete_session(store_id)
+                return
+            except redis.RedisError as e:
+                redisCircuit.recordFailure(e)
+        self.fallbackSessions.set(store_id, {})
+
+    def restoreFallbackSession(self, store_id:str, sessionData:dict) -> Optional[dict]:
+        try:
+            if sessionData:
+                self.client.set(store_id, self.serializer.encode(sessionData), ex=Config.PERMANENT_SESSION_LIFETIME)
+            else:
+                self.client.delete(store_id)
+            self.fallbackSessions.invalidate(store_id)
+        except redis.RedisError as e:
+            redisCircuit.recordFailure(e)
+        return sessionData or None
+
+def createSessionInterface(app:Flask) -> TieredSessionInterface:
+    config = app.config
+    return TieredSessionInterface(
+        app,
+        config['SESSION_REDIS'],
+        key_prefix=config.get('SESSION_KEY_PREFIX', Defaults.SESSION_KEY_PREFIX),
+        permanent=config.get('SESSION_PERMANENT', Defaults.SESSION_PERMANENT),
+        sid_length=config.get('SESSION_ID_LENGTH', Defaults.SESSION_ID_LENGTH),
+        serialization_format=config.get('SESSION_SERIALIZATION_FORMAT', Defaults.SESSION_SERIALIZATION_FORMAT)
+    )
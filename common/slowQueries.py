@@ -0,0 +1,237 @@
+import argparse
+import hashlib
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import UTC, datetime
+from typing import Any, List
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from common.helpers.explain import summarizeExplain
+from config import Config
+
+# usage: python -m common.slowQueries rank slow_queries.log --top 20
+
+explainableCommands = {'find', 'aggregate', 'count', 'distinct', 'findAndModify', 'update', 'delete'}
+# driver and session fields that explain does not accept
+nonExplainFields = {'lsid', '$db', '$clusterTime', '$readPreference', 'txnNumber', 'autocommit', 'startTransaction', 'readConcern', 'writeConcern'}
+
+slowQueryLogger = logging.getLogger('slowQuery')
+slowQueryLogger.propagate = False
+slowQueryLogger.setLevel(logging.INFO)
+slowQueryHandler = logging.FileHandler(Config.SLOW_QUERY_LOG_PATH, delay=True) if Config.SLOW_QUERY_LOG_PATH else logging.StreamHandler(sys.stdout)
+slowQueryHandler.setFormatter(logging.Formatter('%(message)s'))
+slowQueryLogger.addHandler(slowQueryHandler)
+
+def redactShape(value:Any) -> Any:
+    if isinstance(value, dict):
+        return {key: redactShape(fieldValue) for key, fieldValue in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return [redactShape(item) for item in value]
+    return '?'
+
+def redactPipeline(pipeline:List[dict]) -> List[dict]:
+    # $sort and $project carry no user values, keep them readable
+    return [
+        stage if set(stage) & {'$sort', '$project'} else redactShape(stage)
+        for stage in pipeline
+    ]
+
+def getQueryShape(commandName:str, command:dict) -> dict[str, Any]:
+    if commandName == 'aggregate':
+        return {'pipeline': redactPipeline(command.get('pipeline', []))}
+    if commandName in ('update', 'delete'):
+        statements = command.get(f'{commandName}s') or [{}]
+        return {'filter': redactShape(statements[0].get('q', {}))}
+
+    shape = {'filter': redactShape(command.get('filter', command.get('query', {})))}
+    if command.get('sort'):
+        shape['sort'] = command['sort']
+    if command.get('key'):
+        shape['key'] = command['key']
+    return shape
+
+def getShapeId(collectionName:str, commandName:str, shape:dict) -> str:
+    shapeKey = json.dumps([collectionName, commandName, shape], sort_keys=True, default=str)
+    return hashlib.sha1(shapeKey.encode()).hexdigest()[:12]
+
+def getReturnedCount(reply:dict) -> int | None:
+    cursor = reply.get('cursor') if isinstance(reply, dict) else None
+    if isinstance(cursor, dict):
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', [])))
+    if isinstance(reply, dict) and 'n' in reply:
+        return reply['n']
+    return None
+
+class SlowQueryLog:
+    def __init__(self, thresholdMs:int, intervalSeconds:int):
+        self.thresholdMs = thresholdMs
+        self.intervalSeconds = intervalSeconds
+        self.client: MongoClient | None = None
+        # shapeId -> [last logged time, suppressed count, suppressed duration, logged record fields]
+        self.shapes: dict[str, list] = {}
+        self.lock = threading.Lock()
+        self.queue: queue.Queue = queue.Queue(maxsize=100)
+        self.worker: threading.Thread | None = None
+
+    def enabled(self) -> bool:
+        return self.thresholdMs > 0
+
+    def observe(self, endpoint:str, databaseName:str, command:dict, commandName:str, durationMs:float, reply:dict = None) -> None:
+        if durationMs < self.thresholdMs or commandName == 'explain':
+            return
+
+        collectionName = command.get(commandName)
+        collectionName = collectionName if isinstance(collectionName, str) else None
+        shape = getQueryShape(commandName, command)
+        shapeId = getShapeId(collectionName, commandName, shape)
+
+        # only the first slow run of a shape per interval is logged, later ones are counted into it
+        now = time.monotonic()
+        with self.lock:
+            shapeState = self.shapes.get(shapeId)
+            if shapeState and now - shapeState[0] < self.intervalSeconds:
+                shapeState[1] += 1
+                shapeState[2] += durationMs
+                return
+            suppressed, suppressedDurationMs = (shapeState[1], shapeState[2]) if shapeState else (0, 0.0)
+            shapeFields = {
+                'endpoint': endpoint,
+                'database': databaseName,
+                'collection': collectionName,
+                'command': commandName,
+                'shapeId': shapeId,
+                'shape': shape
+            }
+            self.shapes[shapeId] = [now, 0, 0.0, shapeFields]
+
+        record = {
+            'type': 'slowQuery',
+            'timestamp': datetime.now(UTC).isoformat(),
+            **shapeFields,
+            'durationMs': round(durationMs, 3),
+            'returned': getReturnedCount(reply),
+            'suppressed': suppressed,
+            'suppressedDurationMs': round(suppressedDurationMs, 3)
+        }
+        explainCommand = {
+            key: value for key, value in command.items() if key not in nonExplainFields
+        } if commandName in explainableCommands else None
+
+        try:
+            self.queue.put_nowait((record, databaseName, explainCommand))
+        except queue.Full:
+            return
+        self.startWorker()
+
+    def startWorker(self) -> None:
+        if self.worker and self.worker.is_alive():
+            return
+        with self.lock:
+            if self.worker and self.worker.is_alive():
+                return
+            self.worker = threading.Thread(target=self.run, name='slowQueryLog', daemon=True)
+            self.worker.start()
+
+    def run(self) -> None:
+        # explain runs off the request thread, the caller already has its response
+        while True:
+            try:
+                record, databaseName, explainCommand = self.queue.get(timeout=max(self.intervalSeconds, 1))
+            except queue.Empty:
+                record = None
+            if record:
+                if explainCommand and self.client is not None:
+                    try:
+                        explainResult = self.client[databaseName].command('explain', explainCommand, verbosity='executionStats')
+                        record['explain'] = summarizeExplain(explainResult)
+                    except PyMongoError as e:
+                        record['explainError'] = str(e)
+                slowQueryLogger.info(json.dumps(record, default=str))
+            self.flushSuppressed()
+
+    def flushSuppressed(self) -> None:
+        # a shape that is not slow again would keep its suppressed runs forever, write them once its interval is over
+        now = time.monotonic()
+        records = []
+        with self.lock:
+            for shapeId, shapeState in list(self.shapes.items()):
+                if now - shapeState[0] < self.intervalSeconds:
+                    continue
+                del self.shapes[shapeId]
+                if shapeState[1]:
+                    records.append({
+                        'type': 'slowQuerySummary',
+                        'timestamp': datetime.now(UTC).isoformat(),
+                        **shapeState[3],
+                        'suppressed': shapeState[1],
+                        'suppressedDurationMs': round(shapeState[2], 3)
+                    })
+
+        for record in records:
+            slowQueryLogger.info(json.dumps(record, default=str))
+
+slowQueryLog = SlowQueryLog(Config.SLOW_QUERY_THRESHOLD_MS, Config.SLOW_QUERY_LOG_INTERVAL)
+
+def readRecords(logPath:str) -> List[dict]:
+    records = []
+    with open(logPath) as logFile:
+        for line in logFile:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get('type') in ('slowQuery', 'slowQuerySummary'):
+                records.append(record)
+    return records
+
+def rankShapes(records:List[dict]) -> List[dict]:
+    shapes = {}
+    for record in records:
+        shape = shapes.setdefault(record['shapeId'], {
+            'shapeId': record['shapeId'],
+            'collection': record['collection'],
+            'command': record['command'],
+            'shape': record['shape'],
+            'endpoints': set(),
+            'count': 0,
+            'totalMs': 0.0,
+            'maxMs': 0.0,
+            'explain': None
+        })
+        shape['endpoints'].add(record['endpoint'])
+        # a summary only carries the runs suppressed after the last logged one
+        logged = record['type'] == 'slowQuery'
+        shape['count'] += int(logged) + record.get('suppressed', 0)
+        shape['totalMs'] += record.get('durationMs', 0) + record.get('suppressedDurationMs', 0)
+        if logged:
+            shape['maxMs'] = max(shape['maxMs'], record['durationMs'])
+        shape['explain'] = record.get('explain') or shape['explain']
+
+    return sorted(shapes.values(), key=lambda shape: shape['totalMs'], reverse=True)
+
+def printRanking(shapes:List[dict]) -> None:
+    for shape in shapes:
+        explain = shape['explain'] or {}
+        print(f'{shape["totalMs"]:>12.1f} ms total  {shape["count"]:>6} runs  {shape["maxMs"]:>10.1f} ms max  {shape["collection"]}.{shape["command"]} [{shape["shapeId"]}]')
+        print(f'    shape    : {json.dumps(shape["shape"], default=str)}')
+        print(f'    endpoints: {", ".join(sorted(str(endpoint) for endpoint in shape["endpoints"]))}')
+        if explain:
+            print(f'    plan     : {" <- ".join(str(stage) for stage in explain["stages"])}  examined {explain["docsExamined"]} docs / {explain["keysExamined"]} keys, returned {explain["returned"]}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Rank slow query shapes by total time')
+    parser.add_argument('command', choices=['rank'])
+    parser.add_argument('log', nargs='?', default=Config.SLOW_QUERY_LOG_PATH)
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    if not args.log:
+        parser.error('log path is required when SLOW_QUERY_LOG_PATH is not set')
+    printRanking(rankShapes(readRecords(args.log))[:args.top])
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,8 @@ load_dotenv()
 
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY')
+    # defer redis and mongo connections to first use, on by default on cloud run
+    LAZY_STARTUP = os.getenv('LAZY_STARTUP', 'true' if os.getenv('K_SERVICE') else 'false') == 'true'
     SESSION_TYPE = 'redis'
     SESSION_REDIS = os.getenv('REDIS_URL')
     SESSION_PERMANENT = False
@@ -14,4 +16,55 @@ class Config:
     SESSION_COOKIE_DOMAIN=None
     
     MONGODB_URI = os.getenv('MONGODB_URI')
-    MONGODB_DB = os.getenv('MONGODB_DB')
\ No newline at end of file
+    MONGODB_DB = os.getenv('MONGODB_DB')
+    MONGODB_MAX_POOL_SIZE = int(os.getenv('MONGODB_MAX_POOL_SIZE', 20))
+    MONGODB_MIN_POOL_SIZE = int(os.getenv('MONGODB_MIN_POOL_SIZE', 2))
+    MONGODB_MAX_IDLE_TIME_MS = int(os.getenv('MONGODB_MAX_IDLE_TIME_MS', 300000))
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGODB_COMPRESSORS = os.getenv('MONGODB_COMPRESSORS', 'zstd,zlib')
+    MONGODB_RETRY_WRITES = os.getenv('MONGODB_RETRY_WRITES', 'true') == 'true'
+    MONGODB_SECONDARY_READS = os.getenv('MONGODB_SECONDARY_READS', 'true') == 'true'
+    MONGODB_MAX_STALENESS_SECONDS = int(os.getenv('MONGODB_MAX_STALENESS_SECONDS', 90))
+    MONGODB_ENSURE_INDEXES = os.getenv('MONGODB_ENSURE_INDEXES', 'false') == 'true'
+    MONGODB_MIGRATE_ON_START = os.getenv('MONGODB_MIGRATE_ON_START', 'false') == 'true'
+    MONGO_COMMAND_HEADER = os.getenv('MONGO_COMMAND_HEADER', 'false') == 'true'
+    HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', 5))
+
+    SLOW_QUERY_THRESHOLD_MS = int(os.getenv('SLOW_QUERY_THRESHOLD_MS', 100))
+    SLOW_QUERY_LOG_INTERVAL = int(os.getenv('SLOW_QUERY_LOG_INTERVAL', 60))
+    SLOW_QUERY_LOG_PATH = os.getenv('SLOW_QUERY_LOG_PATH')
+
+    PAGINATION_DEFAULT_LIMIT = int(os.getenv('PAGINATION_DEFAULT_LIMIT', 50))
+    PAGINATION_MAX_LIMIT = int(os.getenv('PAGINATION_MAX_LIMIT', 500))
+    STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+
+    LOW_STOCK_THRESHOLD = int(os.getenv('LOW_STOCK_THRESHOLD', 10))
+
+    REFERENCE_CACHE_TTL = int(os.getenv('REFERENCE_CACHE_TTL', 300))
+    REFERENCE_CACHE_SIZE = int(os.getenv('REFERENCE_CACHE_SIZE', 1024))
+
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true') == 'true'
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 60))
+    SESSION_CACHE_TTL = float(os.getenv('SESSION_CACHE_TTL', 5))
+    SESSION_CACHE_SIZE = int(os.getenv('SESSION_CACHE_SIZE', 4096))
+    SESSION_FALLBACK_SIZE = int(os.getenv('SESSION_FALLBACK_SIZE', 10000))
+    REDIS_TIMEOUT = float(os.getenv('REDIS_TIMEOUT', 0.5))
+    REDIS_RECONNECT_BASE_DELAY = float(os.getenv('REDIS_RECONNECT_BASE_DELAY', 1))
+    REDIS_RECONNECT_MAX_DELAY = float(os.getenv('REDIS_RECONNECT_MAX_DELAY', 60))
+
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_HEADER_ENABLED = os.getenv('PROFILE_HEADER_ENABLED', 'false') == 'true'
+    PROFILE_TOKEN_MAX_AGE = int(os.getenv('PROFILE_TOKEN_MAX_AGE', 3600))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 20))
+
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 8))
+    BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', 2))
+    # request threads that never wait on bcrypt, so a login burst cannot stall every other endpoint
+    BCRYPT_RESERVED_THREADS = int(os.getenv('BCRYPT_RESERVED_THREADS', 4))
+    BCRYPT_QUEUE_SIZE = max(0, min(
+        int(os.getenv('BCRYPT_QUEUE_SIZE', GUNICORN_THREADS)),
+        GUNICORN_THREADS - BCRYPT_WORKERS - BCRYPT_RESERVED_THREADS
+    ))
+    BCRYPT_TIMEOUT = int(os.getenv('BCRYPT_TIMEOUT', 10))
\ No newline at end of file
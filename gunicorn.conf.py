@@ -0,0 +1,45 @@
+import multiprocessing
+import os
+from config import Config
+
+# usage: gunicorn --config gunicorn.conf.py main:app
+
+bind = f'0.0.0.0:{os.getenv("PORT", 8080)}'
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+# also bounds the bcrypt queue, see BCRYPT_QUEUE_SIZE
+threads = Config.GUNICORN_THREADS
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+# the app is imported once in the master, every worker opens its own mongo client after fork
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true') == 'true'
+
+def on_starting(server):
+    from common.migrateBranchProduct import migrateBranchProduct
+
+    # off by default, the migration is a one-off deploy step and scans before the master binds
+    if Config.MONGODB_MIGRATE_ON_START:
+        result = migrateBranchProduct()
+        server.log.info(f'migrated {result["products"]} branch products from {result["branches"]} branches, filled nameLower on {result["nameLower"]}')
+
+def when_ready(server):
+    from common.db import dbInstance
+
+    # anything the master connected while importing the app is never used by the workers
+    dbInstance.close()
+    server.log.info(f'mongo pool budget: {workers} workers x {Config.MONGODB_MAX_POOL_SIZE} connections')
+
+def post_fork(server, worker):
+    from common.db import dbInstance
+    from common.health import healthChecker
+    from common.redisCircuit import redisCircuit
+
+    dbInstance.close()
+    dbInstance.connect()
+    redisCircuit.afterFork()
+    if Config.LAZY_STARTUP:
+        return
+    try:
+        # server selection here keeps it off the first request, minPoolSize fills the pool in the background
+        dbInstance.client.admin.command('ping')
+    except Exception as e:
+        server.log.warning(f'Mongo warm up failed in worker {worker.pid} - {str(e)}')
+    healthChecker.start()
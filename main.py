@@ -11,43 +11,56 @@ from api.v1.product.routes import productRoutes
 from api.v1.request.routes import requestRoutes
 from api.v1.branch.routes import branchRoutes
 from api.v1.user.routes import userRoutes
-from flask_session import Session
-from common.db import dbInstance
+from common.health import healthChecker
+from common.indexes import ensureIndexes
+from common.listeners import getCommandCount
+from common.metrics import initMetrics, metricsResponse
+from common.profiler import initProfiler
+from common.redisCircuit import redisCircuit
+from common.session import createSessionInterface
+from common.helpers.jsonProvider import OrjsonProvider
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 app.config.from_object(Config)
 
-try:
-    redis_client = redis.from_url(Config.SESSION_REDIS)
-    redis_client.ping()
-    app.config['SESSION_REDIS'] = redis_client
-    server_session = Session(app)
-except (redis.ConnectionError, redis.RedisError) as e:
-    print(f'Warning: Redis connection failed - {str(e)}')
+# an unreachable redis opens the circuit, sessions fall back to process memory until it reconnects
+# with LAZY_STARTUP the ping is skipped and the first session read finds out
+redis_client = redis.from_url(Config.SESSION_REDIS, socket_connect_timeout=Config.REDIS_TIMEOUT, socket_timeout=Config.REDIS_TIMEOUT)
+app.config['SESSION_REDIS'] = redis_client
+redisCircuit.connect(redis_client, probe=not Config.LAZY_STARTUP)
+app.session_interface = createSessionInterface(app)
 
 CORS(app, supports_credentials=True)
+initMetrics(app)
+
+if Config.MONGODB_ENSURE_INDEXES:
+    ensureIndexes()
 
 @app.route('/')
 def index():
-    mongo_status = 'Connected'
-    try:
-        dbInstance.client.admin.command('ping')
-    except Exception as e:
-        mongo_status = f'Error: {str(e)}'
-
-    redis_status = 'Connected'
-    try:
-        app.config['SESSION_REDIS'].ping()
-    except Exception as e:
-        redis_status = f'Error: Redis is not connected'
-    
+    # answered from the health checker snapshot, never waits on mongo or redis
+    snapshot = healthChecker.getSnapshot()
     return jsonify({
         'message': 'TA Kapita Selekta',
-        'mongodb_status': mongo_status,
-        'redis_status': redis_status
+        'mongodb_status': snapshot['mongodb']['status'],
+        'redis_status': snapshot['redis']['status']
     })
 
+@app.route('/healthz')
+def healthz():
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    snapshot = healthChecker.getSnapshot()
+    return jsonify(snapshot), 200 if snapshot['ready'] else 503
+
+@app.route('/metrics')
+def metrics():
+    return metricsResponse()
+
 @app.before_request
 def verifySession():
     if request.method == 'OPTIONS':
@@ -55,7 +68,8 @@ def verifySession():
 
     if request.endpoint and (
         request.endpoint.startswith('swagger') or 
-        request.endpoint == 'index' or
+        request.endpoint in ('index', 'healthz', 'readyz') or
+        request.endpoint == 'metrics' or
         request.endpoint.startswith('auth')
     ):
         return
@@ -66,6 +80,12 @@ def verifySession():
 
     g.user = userData
 
+@app.after_request
+def addMongoCommandHeader(response):
+    if Config.MONGO_COMMAND_HEADER:
+        response.headers['X-Mongo-Commands'] = str(getCommandCount())
+    return response
+
 # ENDPOINT /v1/auth/
 app.register_blueprint(authRoutes)
 
@@ -91,6 +111,9 @@ app.register_blueprint(userRoutes)
 app.register_blueprint(swaggerui_blueprint, url_prefix=swagger_url)
 app.register_blueprint(swagger_blueprint)
 
+# wraps the registered views, keep after every blueprint
+initProfiler(app)
+
 @app.errorhandler(HTTPException)
 def handle_exception(e:HTTPException):
     return jsonify({f'message': e.description}), e.code
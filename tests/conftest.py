@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+import fakeredis
+import mongomock
+import pytest
+from bson import ObjectId
+from flask.testing import FlaskClient
+
+# config is read at import, so the environment has to be in place before the app is imported
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SECRET_KEY', 'test')
+os.environ.setdefault('REDIS_URL', 'redis://localhost:6379/0')
+os.environ['MONGODB_DB'] = 'test'
+os.environ['MONGODB_ENSURE_INDEXES'] = 'false'
+os.environ['LAZY_STARTUP'] = 'true'
+
+from common.db import dbInstance
+
+dbInstance.client = mongomock.MongoClient()
+dbInstance.db = dbInstance.client['test']
+
+import main
+from common.helpers.cache import caches
+from common.redisCircuit import redisCircuit
+from common.session import createSessionInterface
+
+@pytest.fixture
+def app():
+    for collectionName in dbInstance.db.list_collection_names():
+        dbInstance.db[collectionName].delete_many({})
+    for cache in caches.values():
+        cache.clear()
+    yield main.app
+
+@pytest.fixture
+def database(app):
+    return dbInstance.db
+
+@pytest.fixture
+def redisClient(app):
+    # sessions and the response cache on a fake redis, restored after the test
+    redisClient = fakeredis.FakeRedis()
+    previousRedis = app.config['SESSION_REDIS']
+    previousInterface = app.session_interface
+    app.config['SESSION_REDIS'] = redisClient
+    redisCircuit.connect(redisClient)
+    app.session_interface = createSessionInterface(app)
+    yield redisClient
+    app.config['SESSION_REDIS'] = previousRedis
+    app.session_interface = previousInterface
+    redisCircuit.connect(previousRedis, probe=False)
+
+def createClient(app, role:str = 'inventory', branch:dict = None) -> FlaskClient:
+    client = app.test_client()
+    # session cookies are secure only
+    client.environ_base['wsgi.url_scheme'] = 'https'
+    with client.session_transaction() as session:
+        session['user'] = {'_id': str(ObjectId()), 'userRole': role, **({'branch': branch} if branch else {})}
+    return client
+
+@pytest.fixture
+def atomicWrites(monkeypatch):
+    # mongod applies every single document write atomically, mongomock needs a lock to race like it
+    writeLock = threading.RLock()
+    for methodName in ['find_one_and_update', 'update_one', 'update_many', 'bulk_write', 'insert_one', 'delete_one']:
+        method = getattr(mongomock.Collection, methodName)
+        def lockedMethod(*args, method=method, **kwargs):
+            with writeLock:
+                return method(*args, **kwargs)
+        monkeypatch.setattr(mongomock.Collection, methodName, lockedMethod)
+
+def insertAcceptFixture(database, stock:dict[str, int], requests:list[dict[str, int]]) -> dict:
+    # products with the given stock, one branch and one pending request per entry of requests
+    productIds = {}
+    for name, count in stock.items():
+        productIds[name] = str(database['PRODUCT'].insert_one({
+            'name': name,
+            'count': count,
+            'merk': 'merk',
+            'condition': 'good',
+            'vendor': {'vendorId': str(ObjectId()), 'vendorName': 'vendor'},
+            'activeStatus': True,
+            'setup': {}
+        }).inserted_id)
+    branchId = database['VMS BRANCH'].insert_one({'branchName': 'Branch A', 'activeStatus': True, 'setup': {}}).inserted_id
+    requestIds = [str(database['REQUEST'].insert_one({
+        'product': [
+            {'productId': productIds[name], 'name': name, 'quantity': quantity}
+            for name, quantity in requestProducts.items()
+        ],
+        'status': 'on request',
+        'branch': {'branchId': str(branchId), 'branchName': 'Branch A'},
+        'totalProduct': len(requestProducts),
+        'setup': {}
+    }).inserted_id) for requestProducts in requests]
+    return {'productIds': productIds, 'branchId': branchId, 'requestIds': requestIds}
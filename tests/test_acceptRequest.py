@@ -0,0 +1,87 @@
+import threading
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+import api.v1.request.controller as requestController
+from conftest import createClient, insertAcceptFixture
+
+def getStock(database, productId:str) -> int:
+    return database['PRODUCT'].find_one({'_id': ObjectId(productId)})['count']
+
+def test_parallel_accepts_never_oversell(app, database, atomicWrites):
+    fixture = insertAcceptFixture(database, {'Product 1': 1}, [{'Product 1': 1}] * 8)
+    statusCodes = []
+    barrier = threading.Barrier(len(fixture['requestIds']))
+
+    def accept(requestId:str):
+        client = createClient(app)
+        barrier.wait()
+        statusCodes.append(client.post(f'/v1/request/{requestId}/accept').status_code)
+
+    threads = [threading.Thread(target=accept, args=(requestId,)) for requestId in fixture['requestIds']]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statusCodes) == [200] + [400] * 7
+    assert getStock(database, fixture['productIds']['Product 1']) == 0
+    assert database['BRANCH PRODUCT'].find_one({'branchId': fixture['branchId']})['count'] == 1
+    assert database['REQUEST'].count_documents({'status': 'accepted'}) == 1
+
+def test_failed_branch_write_is_undone(app, database, monkeypatch):
+    fixture = insertAcceptFixture(database, {'Product 1': 5, 'Product 2': 5}, [{'Product 1': 2, 'Product 2': 3}])
+    branchProductCollection = database['BRANCH PRODUCT']
+
+    calls = []
+
+    def failingBulkWrite(requests, **kwargs):
+        # the accept's upserts: the first lands, the second fails, later calls are the undo
+        calls.append(requests)
+        if len(calls) > 1:
+            return branchProductCollection.bulk_write(requests, **kwargs)
+        result = branchProductCollection.bulk_write(requests[:1])
+        raise BulkWriteError({
+            'writeErrors': [{'index': 1, 'code': 121, 'errmsg': 'Document failed validation'}],
+            'nUpserted': 1,
+            'upserted': [{'index': 0, '_id': result.upserted_ids[0]}]
+        })
+    monkeypatch.setattr(requestController.branchProductCollection, 'bulk_write', failingBulkWrite, raising=False)
+
+    response = createClient(app).post(f'/v1/request/{fixture["requestIds"][0]}/accept')
+
+    assert response.status_code == 500
+    assert response.is_json
+    assert database['BRANCH PRODUCT'].count_documents({}) == 0
+    assert getStock(database, fixture['productIds']['Product 1']) == 5
+    assert getStock(database, fixture['productIds']['Product 2']) == 5
+    assert database['REQUEST'].find_one({'_id': ObjectId(fixture['requestIds'][0])})['status'] == 'on request'
+
+def test_failed_revert_still_answers_json(app, database, monkeypatch):
+    fixture = insertAcceptFixture(database, {'Product 1': 5}, [{'Product 1': 2}])
+
+    def failingWrite(*args, **kwargs):
+        raise RuntimeError('connection lost')
+    monkeypatch.setattr(requestController.branchProductCollection, 'bulk_write', failingWrite, raising=False)
+    monkeypatch.setattr(requestController.productCollection, 'bulk_write', failingWrite, raising=False)
+
+    response = createClient(app).post(f'/v1/request/{fixture["requestIds"][0]}/accept')
+
+    assert response.status_code == 500
+    assert response.json['message'] == 'connection lost'
+
+def test_invalid_stored_product_id_reopens_the_request(app, database):
+    fixture = insertAcceptFixture(database, {'Product 1': 5, 'Product 2': 5}, [{'Product 1': 2, 'Product 2': 1}])
+    requestId = fixture['requestIds'][0]
+    database['REQUEST'].update_one({'_id': ObjectId(requestId)}, {'$set': {'product.1.productId': 'not-an-id'}})
+
+    response = createClient(app).post(f'/v1/request/{requestId}/accept')
+
+    assert response.status_code == 422
+    assert database['REQUEST'].find_one({'_id': ObjectId(requestId)})['status'] == 'on request'
+    assert getStock(database, fixture['productIds']['Product 1']) == 5
+
+def test_invalid_request_id_is_rejected_before_the_claim(app):
+    response = createClient(app).post('/v1/request/not-an-id/accept')
+
+    assert response.status_code == 422
+    assert response.json['message'] == 'Invalid Request ID'
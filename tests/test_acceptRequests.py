@@ -0,0 +1,111 @@
+import threading
+from bson import ObjectId
+import api.v1.request.controller as requestController
+from conftest import createClient, insertAcceptFixture
+
+def getStock(database, productId:str) -> int:
+    return database['PRODUCT'].find_one({'_id': ObjectId(productId)})['count']
+
+def getStatus(database, requestId:str) -> str:
+    return database['REQUEST'].find_one({'_id': ObjectId(requestId)})['status']
+
+def test_batch_accept_without_transactions(app, database):
+    fixture = insertAcceptFixture(database, {'Product 1': 5}, [{'Product 1': 3}, {'Product 1': 3}, {'Product 1': 2}])
+    requestIds = fixture['requestIds']
+
+    response = createClient(app).post('/v1/request/accept-batch', json=requestIds)
+
+    assert response.status_code == 200
+    assert response.json['data']['accepted'] == [requestIds[0], requestIds[2]]
+    assert response.json['data']['rejected'] == [{'requestId': requestIds[1], 'message': 'Insufficient quantity for product Product 1'}]
+    assert getStock(database, fixture['productIds']['Product 1']) == 0
+    assert database['BRANCH PRODUCT'].find_one({'branchId': fixture['branchId']})['count'] == 5
+    assert [getStatus(database, requestId) for requestId in requestIds] == ['accepted', 'on request', 'accepted']
+    assert database['PRODUCT'].count_documents({'acceptBatchIds': {'$exists': True}}) == 0
+
+def test_batch_accept_reports_requests_claimed_elsewhere(app, database, monkeypatch):
+    fixture = insertAcceptFixture(database, {'Product 1': 5}, [{'Product 1': 1}, {'Product 1': 1}])
+    requestIds = fixture['requestIds']
+    checkAcceptRequests = requestController.checkAcceptRequests
+
+    def racingCheck(requestObjectIds):
+        result = checkAcceptRequests(requestObjectIds)
+        # another inventory user accepts the first request after it was read
+        createClient(app).post(f'/v1/request/{requestIds[0]}/accept')
+        return result
+
+    monkeypatch.setattr(requestController, 'checkAcceptRequests', racingCheck)
+
+    response = createClient(app).post('/v1/request/accept-batch', json=requestIds)
+
+    assert response.status_code == 200
+    assert response.json['data']['accepted'] == [requestIds[1]]
+    assert response.json['data']['rejected'] == [{'requestId': requestIds[0], 'message': 'Request Already Processed'}]
+    assert getStock(database, fixture['productIds']['Product 1']) == 3
+    assert database['BRANCH PRODUCT'].find_one({'branchId': fixture['branchId']})['count'] == 2
+
+def test_batch_accept_gives_stock_back_when_stock_changed(app, database, monkeypatch):
+    fixture = insertAcceptFixture(database, {'Product 1': 5, 'Product 2': 5}, [{'Product 1': 2, 'Product 2': 4}])
+    checkAcceptRequests = requestController.checkAcceptRequests
+
+    def racingCheck(requestObjectIds):
+        result = checkAcceptRequests(requestObjectIds)
+        # stock taken by someone else between the check and the write
+        database['PRODUCT'].update_one({'_id': ObjectId(fixture['productIds']['Product 2'])}, {'$inc': {'count': -3}})
+        return result
+    monkeypatch.setattr(requestController, 'checkAcceptRequests', racingCheck)
+
+    response = createClient(app).post('/v1/request/accept-batch', json=fixture['requestIds'])
+
+    assert response.status_code == 409
+    assert response.json['message'] == 'Product stock changed during batch acceptance, please retry'
+    assert getStock(database, fixture['productIds']['Product 1']) == 5
+    assert getStock(database, fixture['productIds']['Product 2']) == 2
+    assert database['PRODUCT'].count_documents({}) == 2
+    assert database['BRANCH PRODUCT'].count_documents({}) == 0
+    assert getStatus(database, fixture['requestIds'][0]) == 'on request'
+    assert database['PRODUCT'].count_documents({'acceptBatchIds': {'$exists': True}}) == 0
+
+def test_batch_accept_never_recreates_a_deleted_product(app, database, monkeypatch):
+    fixture = insertAcceptFixture(database, {'Product 1': 5, 'Product 2': 5}, [{'Product 1': 2, 'Product 2': 4}])
+    checkAcceptRequests = requestController.checkAcceptRequests
+
+    def racingCheck(requestObjectIds):
+        result = checkAcceptRequests(requestObjectIds)
+        database['PRODUCT'].delete_one({'_id': ObjectId(fixture['productIds']['Product 2'])})
+        return result
+    monkeypatch.setattr(requestController, 'checkAcceptRequests', racingCheck)
+
+    response = createClient(app).post('/v1/request/accept-batch', json=fixture['requestIds'])
+
+    assert response.status_code == 409
+    assert database['PRODUCT'].count_documents({}) == 1
+    assert getStock(database, fixture['productIds']['Product 1']) == 5
+    assert getStatus(database, fixture['requestIds'][0]) == 'on request'
+
+def test_parallel_batches_never_oversell(app, database, atomicWrites):
+    fixture = insertAcceptFixture(database, {'Product 1': 4}, [{'Product 1': 1}] * 8)
+    requestIds = fixture['requestIds']
+    batches = [requestIds[0:4], requestIds[2:6], requestIds[4:8], requestIds[6:8] + requestIds[0:2]]
+    accepted = []
+    barrier = threading.Barrier(len(batches))
+
+    def acceptBatch(batch:list[str]):
+        client = createClient(app)
+        barrier.wait()
+        response = client.post('/v1/request/accept-batch', json=batch)
+        if response.status_code == 200:
+            accepted.extend(response.json['data']['accepted'])
+
+    threads = [threading.Thread(target=acceptBatch, args=(batch,)) for batch in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stock = getStock(database, fixture['productIds']['Product 1'])
+    branchProduct = database['BRANCH PRODUCT'].find_one({'branchId': fixture['branchId']})
+    assert stock >= 0
+    assert len(accepted) == len(set(accepted)) == 4 - stock
+    assert (branchProduct['count'] if branchProduct else 0) == 4 - stock
+    assert database['REQUEST'].count_documents({'status': 'accepted'}) == 4 - stock
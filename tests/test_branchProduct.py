@@ -0,0 +1,30 @@
+from bson import ObjectId
+from conftest import createClient, insertAcceptFixture
+
+def insertBranchProducts(database, branchId:ObjectId, names:list[str]):
+    database['BRANCH PRODUCT'].insert_many([{
+        'branchId': branchId,
+        'productId': str(ObjectId()),
+        'name': name,
+        'nameLower': name.lower(),
+        'count': 1
+    } for name in names])
+
+def test_name_search_is_case_insensitive_prefix(app, database):
+    branchId = ObjectId()
+    insertBranchProducts(database, branchId, ['Indomie Goreng', 'indomie Soto', 'Mie Sedaap', 'Super Indomie'])
+    client = createClient(app, 'branch', {'branchId': str(branchId), 'branchName': 'Branch A'})
+
+    response = client.get('/v1/branch/user/product?name=INDOMIE&sort=name&all=true')
+
+    assert response.status_code == 200
+    assert [branchProduct['name'] for branchProduct in response.json['data']] == ['Indomie Goreng', 'indomie Soto']
+    assert all('nameLower' not in branchProduct for branchProduct in response.json['data'])
+
+def test_accept_writes_name_lower(app, database):
+    fixture = insertAcceptFixture(database, {'Product A': 5}, [{'Product A': 2}])
+
+    response = createClient(app).post(f'/v1/request/{fixture["requestIds"][0]}/accept')
+
+    assert response.status_code == 200
+    assert database['BRANCH PRODUCT'].find_one({'branchId': fixture['branchId']})['nameLower'] == 'product a'
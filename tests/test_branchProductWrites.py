@@ -0,0 +1,64 @@
+from bson import ObjectId
+import api.v1.branch.controller as branchController
+from conftest import createClient
+
+def insertProduct(database, name:str) -> str:
+    return str(database['PRODUCT'].insert_one({
+        'name': name,
+        'count': 10,
+        'merk': 'merk',
+        'condition': 'good',
+        'vendor': {'vendorId': str(ObjectId()), 'vendorName': 'vendor'},
+        'activeStatus': True
+    }).inserted_id)
+
+def test_insert_for_missing_branch_leaves_no_row(app, database):
+    productId = insertProduct(database, 'Product 1')
+    client = createClient(app, 'branch', {'branchId': str(ObjectId()), 'branchName': 'Gone'})
+
+    response = client.post('/v1/branch/user/product', json={'productId': productId, 'count': 3})
+
+    assert response.status_code == 404
+    assert database['BRANCH PRODUCT'].count_documents({}) == 0
+
+def test_writes_return_only_the_written_product(app, database):
+    branchId = database['VMS BRANCH'].insert_one({'branchName': 'Branch A', 'activeStatus': True, 'setup': {}}).inserted_id
+    database['BRANCH PRODUCT'].insert_many([
+        {'branchId': branchId, 'productId': str(ObjectId()), 'name': f'Old {index}', 'count': 1} for index in range(5)
+    ])
+    productId = insertProduct(database, 'Product 1')
+    client = createClient(app, 'branch', {'branchId': str(branchId), 'branchName': 'Branch A'})
+
+    inserted = client.post('/v1/branch/user/product', json={'productId': productId, 'count': 3})
+    updated = client.put(f'/v1/branch/user/product/{productId}', json={'count': 7})
+
+    assert inserted.status_code == 200
+    assert [(product['productId'], product['count']) for product in inserted.json['product']] == [(productId, 3)]
+    assert updated.status_code == 200
+    assert [(product['productId'], product['count']) for product in updated.json['product']] == [(productId, 7)]
+    assert 'nameLower' not in inserted.json['product'][0]
+    assert database['BRANCH PRODUCT'].count_documents({'branchId': branchId}) == 6
+
+def test_bulk_update_status_comes_from_the_write(app, database, monkeypatch):
+    branchId = database['VMS BRANCH'].insert_one({'branchName': 'Branch A', 'activeStatus': True, 'setup': {}}).inserted_id
+    database['BRANCH PRODUCT'].insert_many([
+        {'branchId': branchId, 'productId': productId, 'name': productId, 'count': 1} for productId in ['p1', 'p2', 'p3']
+    ])
+    client = createClient(app, 'branch', {'branchId': str(branchId), 'branchName': 'Branch A'})
+    branchProductCollection = database['BRANCH PRODUCT']
+    bulkWrite = branchProductCollection.bulk_write
+
+    def racingBulkWrite(requests, **kwargs):
+        # another user removes p2 just before the write lands
+        branchProductCollection.delete_one({'productId': 'p2'})
+        return bulkWrite(requests, **kwargs)
+    monkeypatch.setattr(branchController.branchProductCollection, 'bulk_write', racingBulkWrite, raising=False)
+
+    response = client.put('/v1/branch/user/product/bulk', json=[
+        {'productId': 'p1', 'count': 5}, {'productId': 'p2', 'count': 6}, {'productId': 'p4', 'count': 7}
+    ])
+
+    assert response.status_code == 200
+    assert {result['productId']: result['status'] for result in response.json['data']} == {'p1': 'updated', 'p2': 'not found', 'p4': 'not found'}
+    assert response.json['updated'] == 1
+    assert branchProductCollection.find_one({'productId': 'p1'})['count'] == 5
@@ -0,0 +1,75 @@
+import threading
+import mongomock
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from common.migrateBranchProduct import migrateBranchProduct
+
+def test_migration_merges_counts_once(database):
+    branchId = ObjectId()
+    database['VMS BRANCH'].insert_one({
+        '_id': branchId,
+        'branchName': 'Branch A',
+        'product': [
+            {'productId': 'p1', 'name': 'Product 1', 'count': 5},
+            {'productId': 'p2', 'name': 'Product 2', 'count': 7}
+        ]
+    })
+    # upserted by an accept before the migration ran
+    database['BRANCH PRODUCT'].insert_one({'branchId': branchId, 'productId': 'p1', 'name': 'Product 1', 'count': 3})
+
+    assert migrateBranchProduct() == {'branches': 1, 'products': 2, 'nameLower': 1}
+    assert migrateBranchProduct() == {'branches': 0, 'products': 0, 'nameLower': 0}
+
+    branchProducts = {
+        branchProduct['productId']: branchProduct
+        for branchProduct in database['BRANCH PRODUCT'].find({'branchId': branchId}, {'_id': 0})
+    }
+    assert branchProducts['p1']['count'] == 8
+    assert branchProducts['p2']['count'] == 7
+    assert [branchProducts['p1']['nameLower'], branchProducts['p2']['nameLower']] == ['product 1', 'product 2']
+    assert 'product' not in database['VMS BRANCH'].find_one({'_id': branchId})
+
+def test_concurrent_migrations_do_not_count_twice(database, atomicWrites):
+    branchIds = [ObjectId() for _ in range(20)]
+    database['VMS BRANCH'].insert_many([{
+        '_id': branchId,
+        'branchName': 'Branch A',
+        'product': [{'productId': 'p1', 'name': 'Product 1', 'count': 5}, {'productId': 'p2', 'name': 'Product 2', 'count': 2}]
+    } for branchId in branchIds])
+    results = []
+    barrier = threading.Barrier(4)
+
+    def migrate():
+        barrier.wait()
+        results.append(migrateBranchProduct())
+
+    threads = [threading.Thread(target=migrate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(result['branches'] for result in results) == len(branchIds)
+    assert database['BRANCH PRODUCT'].count_documents({}) == len(branchIds) * 2
+    assert {branchProduct['count'] for branchProduct in database['BRANCH PRODUCT'].find({'productId': 'p1'})} == {5}
+
+def test_failed_write_gives_products_back_to_the_branch(database, monkeypatch):
+    branchId = ObjectId()
+    branchProducts = [{'productId': 'p1', 'name': 'Product 1', 'count': 5}, {'productId': 'p2', 'name': 'Product 2', 'count': 7}]
+    database['VMS BRANCH'].insert_one({'_id': branchId, 'branchName': 'Branch A', 'product': branchProducts})
+    bulkWrite = mongomock.Collection.bulk_write
+
+    def failingBulkWrite(collection, requests, **kwargs):
+        # the first upsert lands, the second fails
+        bulkWrite(collection, requests[:1], **kwargs)
+        raise BulkWriteError({'writeErrors': [{'index': 1, 'code': 121, 'errmsg': 'Document failed validation'}]})
+    monkeypatch.setattr(mongomock.Collection, 'bulk_write', failingBulkWrite)
+
+    with pytest.raises(BulkWriteError):
+        migrateBranchProduct()
+    monkeypatch.setattr(mongomock.Collection, 'bulk_write', bulkWrite)
+    migrateBranchProduct()
+
+    counts = {branchProduct['productId']: branchProduct['count'] for branchProduct in database['BRANCH PRODUCT'].find({'branchId': branchId})}
+    assert counts == {'p1': 5, 'p2': 7}
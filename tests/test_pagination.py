@@ -0,0 +1,29 @@
+import base64
+import pytest
+from bson import ObjectId, json_util
+from conftest import createClient
+
+def buildCursor(values:list) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+def insertBanks(database, count:int):
+    database['VMS BANK'].insert_many([{'name': f'Bank {index}', 'activeStatus': True} for index in range(count)])
+
+def test_next_cursor_pages_through_every_document(app, database):
+    insertBanks(database, 5)
+    client = createClient(app)
+
+    firstPage = client.get('/v1/bank?limit=3').json
+    secondPage = client.get(f'/v1/bank?limit=3&cursor={firstPage["nextCursor"]}').json
+
+    assert [bank['name'] for bank in firstPage['data'] + secondPage['data']] == [f'Bank {index}' for index in range(5)]
+    assert secondPage['nextCursor'] is None
+
+@pytest.mark.parametrize('value', [{'$ne': None}, {'$where': 'sleep(1000)'}, [ObjectId()]])
+def test_operator_in_cursor_is_rejected(app, database, value):
+    insertBanks(database, 3)
+
+    response = createClient(app).get(f'/v1/bank?cursor={buildCursor([value])}')
+
+    assert response.status_code == 422
+    assert response.json['message'] == 'Invalid Cursor'
@@ -0,0 +1,77 @@
+from datetime import datetime, UTC
+from common.helpers.responseCache import invalidateResponseCache
+from common.redisCircuit import redisCircuit
+from conftest import createClient
+
+def getBankNames(response) -> list[str]:
+    return [bank['name'] for bank in response.json['data']]
+
+def test_bank_list_is_fresh_after_update(app, redisClient):
+    client = createClient(app)
+    bankId = client.post('/v1/bank', json={'name': 'Bank A', 'bankDesc': 'a'}).json['_id']
+
+    response = client.get('/v1/bank')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert getBankNames(response) == ['Bank A']
+    assert client.get('/v1/bank').headers['X-Cache'] == 'HIT'
+
+    assert client.put(f'/v1/bank/{bankId}', json={'name': 'Bank B', 'bankDesc': 'b'}).status_code == 200
+
+    response = client.get('/v1/bank')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert getBankNames(response) == ['Bank B']
+
+def test_bank_list_is_fresh_after_write_in_another_worker(app, redisClient, database):
+    client = createClient(app)
+    client.post('/v1/bank', json={'name': 'Bank A', 'bankDesc': 'a'})
+    assert getBankNames(client.get('/v1/bank')) == ['Bank A']
+
+    # another worker writes and bumps the tag, nothing in this process is cleared
+    database['VMS BANK'].insert_one({
+        'name': 'Bank C',
+        'bankDesc': 'c',
+        'activeStatus': True,
+        'setup': {'createDate': datetime.now(UTC), 'updateDate': datetime.now(UTC)}
+    })
+    with app.test_request_context():
+        invalidateResponseCache('VMS BANK')
+
+    response = client.get('/v1/bank')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert getBankNames(response) == ['Bank A', 'Bank C']
+
+def test_bank_by_id_is_fresh_after_write_in_another_worker(app, redisClient, database):
+    client = createClient(app)
+    bankId = client.post('/v1/bank', json={'name': 'Bank A', 'bankDesc': 'a'}).json['_id']
+    assert client.get(f'/v1/bank/{bankId}').json['name'] == 'Bank A'
+
+    # another worker removes the bank, only the tag in redis tells this process
+    database['VMS BANK'].update_many({}, {'$set': {'activeStatus': False}})
+    assert client.get(f'/v1/bank/{bankId}').status_code == 200
+    with app.test_request_context():
+        invalidateResponseCache('VMS BANK')
+
+    assert client.get(f'/v1/bank/{bankId}').status_code == 404
+
+def test_vendor_by_id_is_not_cached_without_redis(app, database):
+    vendorId = str(database['VMS VENDOR'].insert_one({'vendorName': 'Vendor A', 'activeStatus': True}).inserted_id)
+    client = createClient(app)
+    assert client.get(f'/v1/vendor/{vendorId}').json['data']['vendorName'] == 'Vendor A'
+
+    database['VMS VENDOR'].update_many({}, {'$set': {'vendorName': 'Vendor B'}})
+
+    assert client.get(f'/v1/vendor/{vendorId}').json['data']['vendorName'] == 'Vendor B'
+
+def test_writes_during_redis_outage_invalidate_after_recovery(app, redisClient):
+    client = createClient(app)
+    bankId = client.post('/v1/bank', json={'name': 'Bank A', 'bankDesc': 'a'}).json['_id']
+    assert getBankNames(client.get('/v1/bank')) == ['Bank A']
+
+    # the tag bump of this write cannot reach redis
+    redisCircuit.setState('open')
+    assert client.put(f'/v1/bank/{bankId}', json={'name': 'Bank B', 'bankDesc': 'b'}).status_code == 200
+    redisCircuit.setState('closed')
+
+    response = client.get('/v1/bank')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert getBankNames(response) == ['Bank B']
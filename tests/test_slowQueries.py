@@ -0,0 +1,34 @@
+import json
+import common.slowQueries as slowQueries
+from common.slowQueries import SlowQueryLog, rankShapes
+
+def observeFind(slowQueryLog:SlowQueryLog, durationMs:float):
+    slowQueryLog.observe('product.findAllProduct', 'test', {'find': 'PRODUCT', 'filter': {'name': 'a'}}, 'find', durationMs)
+
+def test_suppressed_runs_are_flushed_when_the_interval_ends(monkeypatch):
+    records = []
+    monkeypatch.setattr(slowQueries.slowQueryLogger, 'info', lambda message: records.append(json.loads(message)))
+    slowQueryLog = SlowQueryLog(thresholdMs=10, intervalSeconds=60)
+    monkeypatch.setattr(slowQueryLog, 'startWorker', lambda: None)
+
+    observeFind(slowQueryLog, 20)
+    observeFind(slowQueryLog, 30)
+    observeFind(slowQueryLog, 40)
+    loggedRecord = slowQueryLog.queue.get_nowait()[0]
+
+    slowQueryLog.flushSuppressed()
+    assert records == []
+
+    # the shape is not slow again, its interval ends anyway
+    for shapeState in slowQueryLog.shapes.values():
+        shapeState[0] -= 60
+    slowQueryLog.flushSuppressed()
+
+    assert len(records) == 1
+    assert records[0]['type'] == 'slowQuerySummary'
+    assert records[0]['shapeId'] == loggedRecord['shapeId']
+    assert (records[0]['suppressed'], records[0]['suppressedDurationMs']) == (2, 70)
+    assert slowQueryLog.shapes == {}
+
+    ranking = rankShapes([loggedRecord, records[0]])
+    assert (ranking[0]['count'], ranking[0]['totalMs'], ranking[0]['maxMs']) == (3, 90, 20)
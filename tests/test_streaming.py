@@ -0,0 +1,66 @@
+import json
+import api.v1.product.controller as productController
+from conftest import createClient
+
+class FailingCursor:
+    # yields the given documents, then fails like a cursor losing its connection
+    def __init__(self, documents:list[dict]):
+        self.documents = iter(documents)
+        self.closed = False
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def batch_size(self, *args, **kwargs):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        document = next(self.documents, None)
+        if document is None:
+            raise RuntimeError('connection lost')
+        return document
+
+    def close(self):
+        self.closed = True
+
+def insertProducts(database, count:int):
+    database['PRODUCT'].insert_many([{'name': f'Product {index}', 'count': index, 'activeStatus': True} for index in range(count)])
+
+def test_stream_returns_every_document(app, database):
+    insertProducts(database, 3)
+
+    response = createClient(app).get('/v1/product', headers={'Accept': 'application/x-ndjson'})
+
+    assert response.status_code == 200
+    assert [json.loads(line)['name'] for line in response.get_data(as_text=True).splitlines()] == ['Product 0', 'Product 1', 'Product 2']
+
+def test_stream_error_before_first_batch_answers_500(app, monkeypatch):
+    cursor = FailingCursor([])
+    monkeypatch.setattr(productController.productReadCollection, 'find', lambda *args, **kwargs: cursor, raising=False)
+
+    response = createClient(app).get('/v1/product?stream=true')
+
+    assert response.status_code == 500
+    assert response.json['message'] == 'connection lost'
+    assert cursor.closed
+
+def test_stream_error_mid_stream_ends_with_error_record(app, monkeypatch):
+    cursors = []
+    def find(*args, **kwargs):
+        cursors.append(FailingCursor([{'name': 'Product 0'}, {'name': 'Product 1'}]))
+        return cursors[-1]
+    monkeypatch.setattr(productController.productReadCollection, 'find', find, raising=False)
+    client = createClient(app)
+
+    ndjsonResponse = client.get('/v1/product', headers={'Accept': 'application/x-ndjson'})
+    lines = [json.loads(line) for line in ndjsonResponse.get_data(as_text=True).splitlines()]
+    jsonResponse = client.get('/v1/product?stream=true')
+
+    assert ndjsonResponse.status_code == 200
+    assert lines == [{'name': 'Product 0'}, {'name': 'Product 1'}, {'error': 'connection lost'}]
+    assert jsonResponse.status_code == 200
+    assert json.loads(jsonResponse.get_data(as_text=True)) == {'data': [{'name': 'Product 0'}, {'name': 'Product 1'}], 'error': 'connection lost'}
+    assert all(cursor.closed for cursor in cursors)